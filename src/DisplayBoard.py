@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cv2
+import numpy as np
+
+
+class DisplayBoard:
+    """
+    미리 할당한 표시판에 층(layer)별로 그리기
+
+        위 (IMAGE 크기)  : 버드아이뷰 차선 마스크 -> 라이다 점 -> 차선 위치 점 (매 프레임)
+        아래 (IMAGE 크기): 초음파 패널 (값이 바뀐 프레임에만)
+
+    표시판은 시작할 때 buffers 장을 만들어 두고 돌려쓴다. 파이프라인 모드에서는 단계와 큐마다
+    표시판을 물고 있어서 그 깊이만큼 (Pipeline.board_buffers) 필요하고, 순차 모드는 한장이면 된다.
+    초음파 패널의 한계선 같은 고정 그림은 배경으로 한번만 그려두고 복사해서 쓴다.
+    """
+
+    def __init__(self, ultra_helper, lidar_helper, size, buffers=1):
+        self.ultra_helper = ultra_helper
+        self.lidar_helper = lidar_helper
+        self.WIDTH, self.HEIGHT = size
+
+        self.boards = [np.zeros((2 * self.HEIGHT, self.WIDTH, 3), np.uint8) for _ in range(buffers)]
+        # 표시판마다 지금 그려져 있는 초음파 값 (같으면 다시 그리지 않는다)
+        self.ultra_drawn = [None] * buffers
+        self.next_index = 0
+
+        self.ultra_background = np.zeros((self.HEIGHT, self.WIDTH, 3), np.uint8)
+        self.ultra_helper.ultra_background(self.ultra_background)
+        for board in self.boards:
+            board[self.HEIGHT:] = self.ultra_background
+
+        # 작업 해상도 마스크를 IMAGE 크기로 키울 때 쓰는 버퍼
+        self.mask_buffer = np.zeros((self.HEIGHT, self.WIDTH), np.uint8)
+
+    def birdseye(self, board):
+        return board[:self.HEIGHT]
+
+    def ultra_panel(self, board):
+        return board[self.HEIGHT:]
+
+    def begin(self, mask, lidar=None):
+        """
+        다음 표시판에 버드아이뷰와 라이다 층을 그려서 돌려준다.
+        """
+
+        index = self.next_index
+        self.next_index = (index + 1) % len(self.boards)
+        board = self.boards[index]
+        view = self.birdseye(board)
+
+        if mask.shape[:2] != (self.HEIGHT, self.WIDTH):
+            cv2.resize(mask, (self.WIDTH, self.HEIGHT), self.mask_buffer, interpolation=cv2.INTER_NEAREST)
+            mask = self.mask_buffer
+        cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR, view)
+
+        if lidar is not None:
+            self.lidar_helper.lidar_visualizer(view, lidar.left, lidar.right)
+        return board
+
+    def draw_ultra(self, board, ultra_data):
+        """
+        초음파 값이 이 표시판에 그려둔 값과 다를 때만 패널을 다시 그린다.
+        """
+
+        index = self.index_of(board)
+        key = tuple(ultra_data)
+        if self.ultra_drawn[index] == key:
+            return False
+
+        panel = self.ultra_panel(board)
+        np.copyto(panel, self.ultra_background)
+        self.ultra_helper.ultra_points(panel, ultra_data)
+        self.ultra_drawn[index] = key
+        return True
+
+    def draw_point(self, board, x, y, color, thickness=30):
+        cv2.line(self.birdseye(board), (x, y), (x, y), color, thickness)
+
+    def index_of(self, board):
+        for index, candidate in enumerate(self.boards):
+            if candidate is board:
+                return index
+        raise ValueError("not a board of this DisplayBoard")
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def default_config():
+    """
+    SelfDriver 설정 (실차 main.py 와 오프라인 재생/벤치마크가 같이 쓴다)
+    """
+
+    return {
+        "image_width": 640,
+        "image_height": 480,
+        "image_offset": 280,
+        "image_gap": 36,
+        "camera_matrix": np.array([
+            [422.037858, 0.0, 245.895397],
+            [0.0,435.589734, 163.625535],
+            [0.0,0.0, 1.0]
+        ]),
+        "distortion_coeffs": np.array([-0.2789296, 0.061035, 0.001786, 0.015238, 0.0]),
+    }
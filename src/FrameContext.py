@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cv2
+
+
+class FrameLayout:
+    """
+    FrameContext 가 쓰는 remap 테이블과 이름 붙은 ROI 배치 (시작할 때 한번만 만든다)
+
+    겹치는 ROI 들은 하나의 영역(band)으로 합쳐서 band 단위로 보정과 색 변환을 하고,
+    각 ROI 는 band 에서 잘라낸 view 로 돌려준다. 그래서 겹친 부분도 두번 변환하지 않는다.
+    검출기를 나중에 불러오면 add_roi 로 ROI 를 더한다. band 는 사각형 (x0, y0, x1, y1) 으로
+    구분하므로 배치가 바뀌어도 이미 만든 FrameContext 캐시와 섞이지 않는다.
+    """
+
+    def __init__(self, image_helper, undistort_map, warp_map, warp_valid_mask, canny_thresholds, rois=None, lane_kernels=(9, 4)):
+        self.image_helper = image_helper
+        self.undistort_map = undistort_map
+        self.UNDISTORT_MAP = image_helper.fix_map(undistort_map)
+        self.WARP_MAP = warp_map
+        self.WARP_VALID_MASK = warp_valid_mask
+        self.CANNY_THRESHOLD_LOW, self.CANNY_THRESHOLD_HIGH = canny_thresholds
+        # 차선 마스크의 blur, dilate 커널 크기 (작업 해상도에 맞춘 값)
+        self.LANE_BLUR, self.LANE_DILATE = lane_kernels
+
+        # ROI 이름 -> 사각형, 그리고 (ROI 이름 -> (band 사각형, band 안에서의 slice), band 사각형 -> remap 테이블)
+        self.rects = {}
+        self.bands = ({}, {})
+        self.set_rois(rois or {})
+
+    def add_roi(self, name, rect):
+        rois = dict(self.rects)
+        rois[name] = tuple(rect)
+        self.set_rois(rois)
+
+    def set_rois(self, rois):
+        # 겹치는 ROI 끼리 합치기
+        bands = [(tuple(rect), [name]) for name, rect in rois.items()]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(bands)):
+                for j in range(i + 1, len(bands)):
+                    if self.overlaps(bands[i][0], bands[j][0]):
+                        bands[i] = (self.union(bands[i][0], bands[j][0]), bands[i][1] + bands[j][1])
+                        del bands[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        # 그대로 남은 band 의 remap 테이블은 다시 만들지 않는다.
+        old_maps = self.bands[1]
+        band_rois, band_maps = {}, {}
+        for rect, members in bands:
+            x0, y0, x1, y1 = rect
+            if rect in old_maps:
+                band_maps[rect] = old_maps[rect]
+            else:
+                band_maps[rect] = self.image_helper.fix_map(self.image_helper.crop_map(self.undistort_map, rect))
+            for name in members:
+                rx0, ry0, rx1, ry1 = rois[name]
+                band_rois[name] = (rect, (slice(ry0 - y0, ry1 - y0), slice(rx0 - x0, rx1 - x0)))
+
+        # 다른 스레드가 읽는 중일 수 있으니 한번에 바꿔 끼운다.
+        self.rects = dict(rois)
+        self.bands = (band_rois, band_maps)
+
+    def overlaps(self, a, b):
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    def union(self, a, b):
+        return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class FrameContext:
+    """
+    카메라 프레임 한장에서 나오는 파생 이미지들을 처음 요청될 때 한번만 계산해서 들고 있기
+
+        context = FrameContext(layout, image)
+        context.lane_mask()          # 버드아이뷰 차선 마스크
+        context.roi("bump")          # 왜곡 보정된 ROI (BGR)
+        context.hls("bump")          # 그 ROI 의 HLS
+        context.gray()               # 이름이 없으면 전체 보정 이미지 기준
+
+    돌려주는 배열은 여러 검출기가 같이 쓰므로 읽기만 해야 한다.
+    프레임 하나는 한 스레드에서만 쓴다. (preprocess 에서 만들고 decide 로 넘긴다)
+    """
+
+    CONVERSIONS = {
+        "gray": cv2.COLOR_BGR2GRAY,
+        "hls": cv2.COLOR_BGR2HLS,
+        "hsv": cv2.COLOR_BGR2HSV,
+    }
+
+    def __init__(self, layout, image):
+        self.layout = layout
+        self.image = image
+        self.cache = {}
+
+    def cached(self, key, compute, *args):
+        if key not in self.cache:
+            self.cache[key] = compute(*args)
+        return self.cache[key]
+
+    def undistorted(self):
+        return self.cached("undistorted", self.layout.image_helper.remap_image, self.image, self.layout.UNDISTORT_MAP)
+
+    def warped(self):
+        return self.cached("warped", self.layout.image_helper.remap_image, self.image, self.layout.WARP_MAP)
+
+    def lane_mask(self):
+        layout = self.layout
+        return self.cached("lane_mask", layout.image_helper.lane_processing, self.warped(), layout.WARP_VALID_MASK, layout.CANNY_THRESHOLD_LOW, layout.CANNY_THRESHOLD_HIGH, layout.LANE_BLUR, layout.LANE_DILATE)
+
+    def band(self, rect):
+        return self.cached(("band", rect), self.layout.image_helper.remap_image, self.image, self.layout.bands[1][rect])
+
+    def converted(self, kind, name):
+        """
+        kind 변환 결과, name 이 None 이면 전체 보정 이미지, 아니면 그 ROI 가 속한 band 를 변환해서 잘라낸다.
+        """
+
+        if name is None:
+            return self.cached((kind, None), cv2.cvtColor, self.undistorted(), self.CONVERSIONS[kind])
+
+        rect, region = self.layout.bands[0][name]
+        return self.cached((kind, rect), cv2.cvtColor, self.band(rect), self.CONVERSIONS[kind])[region]
+
+    def roi(self, name):
+        rect, region = self.layout.bands[0][name]
+        return self.band(rect)[region]
+
+    def gray(self, name=None):
+        return self.converted("gray", name)
+
+    def hls(self, name=None):
+        return self.converted("hls", name)
+
+    def hsv(self, name=None):
+        return self.converted("hsv", name)
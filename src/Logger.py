@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+LEVELS = dict((name.lower(), level) for level, name in LEVEL_NAMES.items())
+
+
+class LogWriter(threading.Thread):
+    """
+    로그 한줄씩 큐에서 꺼내서 stream 에 쓰는 백그라운드 스레드
+
+    제어 루프는 큐에 넣기만 하고 터미널 I/O 를 기다리지 않는다.
+    큐가 가득 차면 그 줄은 버리고 버린 개수만 세어 두었다가 다음 줄과 함께 알린다.
+    """
+
+    def __init__(self, stream=sys.stdout, size=1024):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stream = stream
+        self.lines = queue.Queue(size)
+        self.dropped = 0
+
+    def put(self, line):
+        try:
+            self.lines.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                break
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.stream.write("[log] %d lines dropped\n" % dropped)
+            self.stream.write(line + "\n")
+            if self.lines.empty():
+                self.stream.flush()
+
+    def close(self):
+        self.lines.put(None)
+        self.join(1.0)
+
+
+class Logger:
+    """
+    레벨, 메시지별 빈도 제한, 중복 제거가 되는 로거
+
+        log = get_logger("drive")
+        log.info("state %d", state)              # 포맷 문자열마다 1초에 한번까지
+        log.debug("x, y width %d %d", w, h, every=0.5)
+
+    빈도 제한은 포맷 문자열 단위로 건다. 제한에 걸린 호출은 문자열을 만들지도 않는다.
+    제한에 걸린 호출은 내용(인자)과 상관없이 세어 두었다가, 다음에 찍을 때 "(N similar suppressed)" 를
+    붙인다. 간격이 지났어도 직전과 같은 내용이면 한번 더 쉬고 다음에 합쳐서 찍는다.
+    """
+
+    def __init__(self, name, manager):
+        self.name = name
+        self.manager = manager
+        # 포맷 문자열 -> [마지막으로 찍은 시각, 마지막 내용, 그 뒤 생략된 같은 포맷 호출 수]
+        self.history = {}
+
+    def enabled(self, level):
+        return level >= self.manager.level
+
+    def log(self, level, fmt, args, every):
+        if level < self.manager.level:
+            return
+
+        now = self.manager.clock()
+        if every is None:
+            every = self.manager.every
+        entry = self.history.get(fmt)
+        if entry is not None and now - entry[0] < every:
+            entry[2] += 1
+            return
+
+        text = fmt % args if args else fmt
+        suppressed = 0
+        if entry is not None:
+            if entry[1] == text and entry[2] == 0:
+                # 빈도 제한 간격이 지났는데 같은 내용이면 한번 더 쉬고 다음에 합쳐서 찍는다.
+                entry[0] = now
+                entry[2] = 1
+                return
+            suppressed = entry[2]
+        self.history[fmt] = [now, text, 0]
+
+        line = "%s [%s] %s: %s" % (time.strftime("%H:%M:%S"), LEVEL_NAMES[level], self.name, text)
+        if suppressed:
+            # 생략된 호출은 문자열을 만들지 않았으므로 내용이 같았는지는 모른다.
+            line += " (%d similar suppressed)" % suppressed
+        self.manager.write(line)
+
+    def debug(self, fmt, *args, **kwargs):
+        self.log(DEBUG, fmt, args, kwargs.get("every"))
+
+    def info(self, fmt, *args, **kwargs):
+        self.log(INFO, fmt, args, kwargs.get("every"))
+
+    def warn(self, fmt, *args, **kwargs):
+        self.log(WARN, fmt, args, kwargs.get("every"))
+
+    def error(self, fmt, *args, **kwargs):
+        self.log(ERROR, fmt, args, kwargs.get("every"))
+
+
+class LogManager:
+    """
+    이름별 Logger 와 공용 LogWriter 관리
+    writer 스레드는 처음 로그를 쓸 때 띄운다.
+    """
+
+    def __init__(self, level=INFO, every=1.0, stream=sys.stdout, clock=time.time):
+        self.level = level
+        self.every = every
+        self.stream = stream
+        self.clock = clock
+        self.loggers = {}
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def get_logger(self, name):
+        if name not in self.loggers:
+            self.loggers[name] = Logger(name, self)
+        return self.loggers[name]
+
+    def write(self, line):
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = LogWriter(self.stream)
+                    self.writer.start()
+        self.writer.put(line)
+
+    def configure(self, level=None, every=None, stream=None):
+        if level is not None:
+            self.level = LEVELS[level] if level in LEVELS else level
+        if every is not None:
+            self.every = every
+        if stream is not None:
+            self.close()
+            self.stream = stream
+
+    def after_fork(self):
+        # fork 로 만든 자식 프로세스에는 writer 스레드가 없으니 처음 쓸 때 새로 띄우게 한다.
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+
+manager = LogManager()
+
+
+def get_logger(name):
+    return manager.get_logger(name)
+
+
+def configure(level=None, every=None, stream=None):
+    manager.configure(level, every, stream)
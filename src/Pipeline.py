@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+_STOP = object()
+
+
+def put_latest(inbox, item):
+    """
+    큐가 가득 차 있으면 오래된 항목을 버리고 넣는다. 버린 개수를 돌려준다.
+    """
+
+    dropped = 0
+    while True:
+        try:
+            inbox.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                inbox.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def board_buffers(maxsize=1, window=False):
+    """
+    파이프라인에 동시에 떠 있을 수 있는 표시판 수
+
+    preprocess, decision, visualization 단계가 각각 입력 큐에 maxsize 장, 처리 중에 한장씩 물고 있고,
+    window 면 메인 스레드 창 큐에 한장, imshow 중에 한장이 더 있다.
+    """
+
+    buffers = 3 * (maxsize + 1)
+    if window:
+        buffers += 2
+    return buffers
+
+
+class Stage(threading.Thread):
+    """
+    입력 큐 하나를 가진 처리 단계 스레드
+
+    큐가 가득 차 있으면 오래된 항목을 버리고 새 항목을 넣는다.
+    (밀린 프레임을 처리하느라 늦어지는 것보다 최신 프레임만 처리하는 것이 낫다)
+    func 가 None 이 아닌 값을 돌려주면 다음 단계로 넘긴다.
+    """
+
+    def __init__(self, name, func, next_stage=None, maxsize=1):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.func = func
+        self.next_stage = next_stage
+        self.inbox = queue.Queue(maxsize)
+        self.processed = 0
+        self.dropped = 0
+
+    def put(self, item):
+        self.dropped += put_latest(self.inbox, item)
+
+    def stop(self):
+        self.put(_STOP)
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+
+            result = self.func(item)
+            self.processed += 1
+
+            if result is not None and self.next_stage is not None:
+                self.next_stage.put(result)
+
+
+class DrivingPipeline:
+    """
+    decode -> preprocess(warp) -> decision -> visualization 4단계 파이프라인
+
+    프레임 N 의 decision 과 프레임 N+1 의 preprocess 가 겹쳐서 돌아간다.
+    OpenCV 함수는 GIL 을 놓기 때문에 여러 코어를 쓸 수 있다.
+    """
+
+    def __init__(self, driver, sensor_data, publish, show=None):
+        self.driver = driver
+        self.sensor_data = sensor_data
+        self.publish = publish
+        self.show = show
+
+        self.visualization = Stage("visualization", self.visualize) if show is not None else None
+        self.decision = Stage("decision", self.decide, self.visualization)
+        self.preprocessing = Stage("preprocess", driver.preprocess, self.decision)
+        self.decoding = Stage("decode", self.decode, self.preprocessing)
+
+        self.stages = [stage for stage in (self.decoding, self.preprocessing, self.decision, self.visualization) if stage is not None]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def submit_image(self, msg):
+        """
+        카메라 토픽 콜백. 디코딩은 decode 단계 스레드에서 한다.
+        """
+
+        self.decoding.put(msg)
+
+    def decode(self, msg):
+        self.sensor_data.image_callback(msg)
+        return self.sensor_data.snapshot()
+
+    def decide(self, frame):
+        steer, speed = self.driver.decide(frame)
+        self.publish(steer, speed)
+        return self.driver.display_board
+
+    def visualize(self, display_board):
+        self.show(display_board)
+
+    def stats(self):
+        return dict((stage.name, (stage.processed, stage.dropped)) for stage in self.stages)
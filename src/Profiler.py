@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class RingHistogram:
+    """
+    최근 size 개 측정값만 들고 있는 고정 크기 버퍼 (ms 단위)
+    """
+
+    def __init__(self, size=512):
+        self.samples = np.zeros(size)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def percentiles(self, percents=(50, 95, 99)):
+        window = self.samples[:min(self.count, len(self.samples))]
+        if len(window) == 0:
+            return [0.0] * len(percents)
+        return [float(value) for value in np.percentile(window, percents)]
+
+
+class NullPhase:
+    """
+    프로파일러가 꺼져 있을 때 쓰는 아무 일도 안하는 with 블록
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_PHASE = NullPhase()
+
+
+class Phase:
+    def __init__(self, histogram, clock):
+        self.histogram = histogram
+        self.clock = clock
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = self.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add((self.clock() - self.started) * 1000.0)
+        return False
+
+
+class FrameProfiler:
+    """
+    단계별 처리 시간과 프레임 마감(deadline) 초과 횟수 세기
+
+        with profiler.phase("warp"):
+            ...
+        profiler.frame_done(image_stamp)
+
+    꺼져 있으면 phase 는 미리 만들어둔 빈 with 블록을 돌려줄 뿐이라 비용이 거의 없다.
+    report_period 초마다 요약 문자열을 sink(text) 로 보낸다. (파일 쓰기, ROS 토픽 발행 등)
+    """
+
+    def __init__(self, enabled=False, deadline=1.0 / 30, size=512, report_period=5.0, sink=None, clock=time.time):
+        self.enabled = enabled
+        self.deadline = deadline
+        self.size = size
+        self.report_period = report_period
+        self.sink = sink
+        self.clock = clock
+
+        self.histograms = OrderedDict()
+        self.latency = RingHistogram(size)
+        self.cycle = RingHistogram(size)
+        self.frames = 0
+        self.deadline_misses = 0
+        self.last_frame = None
+        self.last_report = clock()
+
+    def histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = RingHistogram(self.size)
+        return self.histograms[name]
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self.histogram(name), self.clock)
+
+    def frame_done(self, image_stamp):
+        """
+        한 프레임의 명령이 나온 시점에 호출. 카메라 수신부터 지금까지가 지연시간이다.
+        """
+
+        if not self.enabled:
+            return
+
+        now = self.clock()
+        latency = now - image_stamp
+        self.latency.add(latency * 1000.0)
+        if self.last_frame is not None:
+            self.cycle.add((now - self.last_frame) * 1000.0)
+        self.last_frame = now
+
+        self.frames += 1
+        if latency > self.deadline:
+            self.deadline_misses += 1
+
+        if self.sink is not None and now - self.last_report >= self.report_period:
+            self.last_report = now
+            self.sink(self.summary())
+
+    def summary(self):
+        lines = ["frames %d, deadline %.1f ms missed %d" % (self.frames, self.deadline * 1000.0, self.deadline_misses)]
+        lines.append("%-14s %8s %8s %8s" % ("phase (ms)", "p50", "p95", "p99"))
+
+        rows = [("latency", self.latency), ("cycle", self.cycle)] + list(self.histograms.items())
+        for name, histogram in rows:
+            lines.append("%-14s %8.2f %8.2f %8.2f" % tuple([name] + histogram.percentiles()))
+        return "\n".join(lines)
+
+
+class FileSink:
+    """
+    요약을 파일 끝에 덧붙이기
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, text):
+        with open(self.path, "a") as f:
+            f.write("[%s]\n%s\n\n" % (time.strftime("%H:%M:%S"), text))
+
+
+class StartupTimer:
+    """
+    프로세스 시작부터 첫 모터 명령까지 구간별 시간
+
+        startup = StartupTimer(started)     # started: main.py 맨 처음에 잰 시각
+        startup.mark("imports")
+        ...
+        startup.mark("first command")
+        log.info(startup.summary(registries))
+    """
+
+    def __init__(self, started=None, clock=time.time):
+        self.clock = clock
+        self.started = started if started is not None else clock()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, self.clock()))
+
+    def done(self, name):
+        return any(mark == name for mark, _ in self.marks)
+
+    def summary(self, registries=()):
+        """
+        registries: 시간을 같이 보여줄 Registry 들 (지금까지 불러온 진입점만)
+        """
+
+        parts = []
+        last = self.started
+        for name, stamp in self.marks:
+            parts.append("%s %.0f ms" % (name, (stamp - last) * 1000.0))
+            last = stamp
+        text = "startup %.0f ms: %s" % ((last - self.started) * 1000.0, ", ".join(parts))
+
+        loads = [registry.report() for registry in registries if registry.load_times]
+        if loads:
+            text += " (lazy loads: %s)" % ", ".join(loads)
+        return text
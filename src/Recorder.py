@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mmap
+import struct
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from Logger import get_logger
+
+log = get_logger("Recorder")
+
+MAGIC = b"XYREC001"
+
+# 레코드 헤더: 종류(1바이트), 패딩, payload 길이, 수신 시각
+RECORD_HEADER = struct.Struct("<B3xId")
+IMAGE_HEADER = struct.Struct("<HHB3x")
+
+KIND_END = 0
+KIND_IMAGE = 1
+KIND_LIDAR = 2
+KIND_ULTRA = 3
+KIND_AR = 4
+
+# AR 마커 한개: id, position xyz, orientation xyzw
+AR_FIELDS = 8
+
+
+def marker_to_row(marker):
+    position = marker.pose.pose.position
+    orientation = marker.pose.pose.orientation
+    return (marker.id, position.x, position.y, position.z, orientation.x, orientation.y, orientation.z, orientation.w)
+
+
+def markers_to_rows(markers):
+    """
+    ar_track_alvar 마커 리스트 -> (N, AR_FIELDS) 배열 (이미 배열이면 그대로)
+    """
+
+    if isinstance(markers, np.ndarray):
+        return markers.reshape(-1, AR_FIELDS)
+    return np.array([marker_to_row(marker) for marker in markers], np.float64).reshape(-1, AR_FIELDS)
+
+
+class SessionRecorder:
+    """
+    센서 데이터를 수신 시각과 함께 append-only 파일에 기록하기
+
+    파일은 mmap 으로 CHUNK 단위로 늘려가며 쓴다. 프로세스가 죽어도 쓴 데이터는 남고,
+    아직 안 쓴 영역은 0 이므로 읽을 때 KIND_END 에서 멈춘다.
+    jpeg_quality 를 주면 카메라 프레임을 JPEG 로 압축해서 저장한다. (None 이면 원본 BGR)
+
+    write_* 는 레코드를 대기열에 넣기만 하고, 압축과 파일 쓰기는 writer 스레드가 받은 순서대로 한다.
+    (센서 콜백 스레드에서 압축하면 기록하는 주행 자체가 느려진다)
+    쓰기가 밀려서 카메라 프레임이 max_pending 장을 넘으면 가장 오래된 프레임을 버린다.
+    다른 센서 레코드는 작아서 버리지 않는다.
+    """
+
+    CHUNK = 64 * 1024 * 1024
+
+    def __init__(self, path, jpeg_quality=90, max_pending=4):
+        self.jpeg_quality = jpeg_quality
+        self.MAX_PENDING = max_pending
+        self.lock = threading.Lock()
+
+        # (종류, 수신 시각, 카메라면 이미지 배열 / 아니면 payload bytes)
+        self.pending = deque()
+        self.pending_images = 0
+        self.dropped = 0
+        self.ready = threading.Condition()
+        self.closing = False
+
+        self.file = open(path, "w+b")
+        self.size = 0
+        self.position = 0
+        self.mm = None
+        self.grow(len(MAGIC))
+        self.mm[0:len(MAGIC)] = MAGIC
+        self.position = len(MAGIC)
+
+        self.writer = threading.Thread(target=self.write_loop, name="recorder")
+        self.writer.daemon = True
+        self.writer.start()
+
+    def grow(self, needed):
+        if self.position + needed <= self.size:
+            return
+
+        while self.size < self.position + needed:
+            self.size += self.CHUNK
+        if self.mm is not None:
+            self.mm.close()
+        self.file.truncate(self.size)
+        self.mm = mmap.mmap(self.file.fileno(), self.size)
+
+    def append(self, kind, stamp, *parts):
+        length = sum(len(part) for part in parts)
+
+        with self.lock:
+            if self.mm is None:
+                return
+            self.grow(RECORD_HEADER.size + length)
+
+            # payload 를 먼저 쓰고 헤더를 마지막에 써서 반쯤 쓴 레코드가 보이지 않게 한다.
+            offset = self.position + RECORD_HEADER.size
+            for part in parts:
+                self.mm[offset:offset + len(part)] = part
+                offset += len(part)
+            self.mm[self.position:self.position + RECORD_HEADER.size] = RECORD_HEADER.pack(kind, length, stamp)
+            self.position = offset
+
+    def encode_image(self, image):
+        height, width = image.shape[:2]
+        if self.jpeg_quality is None:
+            data = np.ascontiguousarray(image).tobytes()
+            jpeg = 0
+        else:
+            _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            data = encoded.tobytes()
+            jpeg = 1
+        return IMAGE_HEADER.pack(height, width, jpeg), data
+
+    def enqueue(self, kind, stamp, payload):
+        with self.ready:
+            if self.closing:
+                return
+            if kind == KIND_IMAGE:
+                if self.pending_images >= self.MAX_PENDING:
+                    self.drop_oldest_image()
+                self.pending_images += 1
+            self.pending.append((kind, stamp, payload))
+            self.ready.notify()
+
+    def drop_oldest_image(self):
+        for index, record in enumerate(self.pending):
+            if record[0] == KIND_IMAGE:
+                del self.pending[index]
+                break
+        self.pending_images -= 1
+        self.dropped += 1
+        log.warn("recorder is behind, dropped %d camera frames", self.dropped)
+
+    def write_loop(self):
+        while True:
+            with self.ready:
+                while not self.pending and not self.closing:
+                    self.ready.wait()
+                if not self.pending:
+                    return
+                kind, stamp, payload = self.pending.popleft()
+                if kind == KIND_IMAGE:
+                    self.pending_images -= 1
+
+            if kind == KIND_IMAGE:
+                self.append(kind, stamp, *self.encode_image(payload))
+            else:
+                self.append(kind, stamp, payload)
+
+    def write_image(self, stamp, image):
+        # 발행된 프레임은 다시 쓰이지 않으므로 복사하지 않고 넘긴다.
+        self.enqueue(KIND_IMAGE, stamp, image)
+
+    def write_lidar(self, stamp, ranges):
+        self.enqueue(KIND_LIDAR, stamp, np.asarray(ranges, np.float32).tobytes())
+
+    def write_ultra(self, stamp, data):
+        self.enqueue(KIND_ULTRA, stamp, np.asarray(data, np.int32).tobytes())
+
+    def write_ar(self, stamp, rows):
+        self.enqueue(KIND_AR, stamp, np.ascontiguousarray(rows, np.float64).tobytes())
+
+    def close(self):
+        # 대기열에 남은 레코드를 다 쓴 뒤에 닫는다.
+        with self.ready:
+            self.closing = True
+            self.ready.notify()
+        if self.writer is not threading.current_thread():
+            self.writer.join()
+
+        with self.lock:
+            if self.mm is None:
+                return
+            self.mm.flush()
+            self.mm.close()
+            self.mm = None
+            self.file.truncate(self.position)
+            self.file.close()
+
+
+class SessionReader:
+    """
+    SessionRecorder 파일을 처음부터 순서대로 읽기
+    (kind, stamp, data) 를 돌려주며 원본 BGR 프레임과 배열은 mmap 을 복사 없이 가리킨다.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[0:len(MAGIC)] != MAGIC:
+            raise ValueError("not a session file: %s" % path)
+
+    def __iter__(self):
+        position = len(MAGIC)
+        end = len(self.mm)
+
+        while position + RECORD_HEADER.size <= end:
+            kind, length, stamp = RECORD_HEADER.unpack_from(self.mm, position)
+            if kind == KIND_END:
+                break
+            offset = position + RECORD_HEADER.size
+            position = offset + length
+            yield kind, stamp, self.decode(kind, offset, length)
+
+    def decode(self, kind, offset, length):
+        if kind == KIND_IMAGE:
+            height, width, jpeg = IMAGE_HEADER.unpack_from(self.mm, offset)
+            offset += IMAGE_HEADER.size
+            length -= IMAGE_HEADER.size
+            data = np.frombuffer(self.mm, np.uint8, count=length, offset=offset)
+            if jpeg:
+                return cv2.imdecode(data, cv2.IMREAD_COLOR)
+            return data.reshape(height, width, 3)
+        if kind == KIND_LIDAR:
+            return np.frombuffer(self.mm, np.float32, count=length // 4, offset=offset)
+        if kind == KIND_ULTRA:
+            return tuple(np.frombuffer(self.mm, np.int32, count=length // 4, offset=offset).tolist())
+        if kind == KIND_AR:
+            return np.frombuffer(self.mm, np.float64, count=length // 8, offset=offset).reshape(-1, AR_FIELDS)
+        return None
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import importlib
+
+from Logger import get_logger
+
+log = get_logger("Registry")
+
+
+class Registry:
+    """
+    이름 -> "모듈:속성" 진입점 표
+
+        registry = Registry({"BumpDetect": "detect.Bump:BumpDetect"})
+        BumpDetect = registry.load("BumpDetect")   # 이때 처음 import
+
+    처음 load 할 때만 모듈을 import 하고 걸린 시간을 적어둔다. (report 로 확인)
+    """
+
+    def __init__(self, entry_points=None, clock=time.time):
+        self.entry_points = dict(entry_points or {})
+        self.clock = clock
+        self.loaded = {}
+        self.load_times = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, target):
+        self.entry_points[name] = target
+
+    def names(self):
+        return sorted(self.entry_points)
+
+    def is_loaded(self, name):
+        return name in self.loaded
+
+    def load(self, name):
+        if name in self.loaded:
+            return self.loaded[name]
+
+        with self.lock:
+            if name not in self.loaded:
+                module_name, attribute = self.entry_points[name].split(":")
+                started = self.clock()
+                value = getattr(importlib.import_module(module_name), attribute)
+                self.load_times[name] = self.clock() - started
+                self.loaded[name] = value
+                log.debug("loaded %s in %.1f ms", name, self.load_times[name] * 1000)
+        return self.loaded[name]
+
+    def report(self):
+        """
+        불러온 진입점과 import 시간 (불러온 순서가 아니라 이름순)
+        """
+
+        return ", ".join("%s %.1f ms" % (name, self.load_times[name] * 1000) for name in sorted(self.load_times))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+기록한 센서 세션을 실제 시간보다 빠르게 SelfDriver 에 다시 넣어보기
+
+    python Replay.py session.rec --out steer.csv
+    python Replay.py session.rec --compare steer.csv   # 빌드끼리 steer/speed 비교
+"""
+
+import sys
+import csv
+import argparse
+from collections import namedtuple
+
+from SensorData import SensorData
+from SelfDriver import SelfDriver
+from DriverConfig import default_config
+from Recorder import SessionReader, KIND_IMAGE, KIND_LIDAR, KIND_ULTRA, KIND_AR
+
+Command = namedtuple("Command", ["stamp", "frame", "steer", "speed"])
+
+
+class VirtualClock:
+    """
+    재생 중인 레코드의 수신 시각을 돌려주는 시계
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def set(self, now):
+        self.now = now
+
+
+class ReplayEngine:
+    def __init__(self, path, config=None):
+        self.reader = SessionReader(path)
+        self.clock = VirtualClock()
+
+        config = dict(config or default_config())
+        config["clock"] = self.clock
+        config.setdefault("headless", True)
+
+        self.sensor_data = SensorData(clock=self.clock)
+        self.driver = SelfDriver(config)
+
+    def run(self):
+        """
+        레코드를 순서대로 넣고, 카메라 프레임마다 get_next_direction 결과를 모은다.
+        """
+
+        commands = []
+        for kind, stamp, data in self.reader:
+            self.clock.set(stamp)
+
+            if kind == KIND_LIDAR:
+                self.sensor_data.publish_lidar(data)
+            elif kind == KIND_ULTRA:
+                self.sensor_data.publish_ultra(data)
+            elif kind == KIND_AR:
+                self.sensor_data.publish_ar(data)
+            elif kind == KIND_IMAGE:
+                self.sensor_data.publish_image(data)
+                steer, speed = self.driver.get_next_direction(self.sensor_data)
+                commands.append(Command(stamp, self.sensor_data.image_frame.seq, steer, speed))
+
+        return commands
+
+
+def save_commands(path, commands):
+    with open(path, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(Command._fields)
+        for command in commands:
+            writer.writerow(["%.6f" % command.stamp, command.frame, command.steer, command.speed])
+
+
+def load_commands(path):
+    with open(path) as f:
+        reader = csv.reader(f)
+        next(reader)
+        return [Command(float(row[0]), int(row[1]), int(row[2]), int(row[3])) for row in reader]
+
+
+def compare_commands(baseline, commands):
+    """
+    프레임별로 steer/speed 가 달라진 곳 목록
+    """
+
+    differences = []
+    for expected, actual in zip(baseline, commands):
+        if (expected.steer, expected.speed) != (actual.steer, actual.speed):
+            differences.append((expected, actual))
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay a recorded sensor session through SelfDriver")
+    parser.add_argument("session", help="session file written by main.py --record")
+    parser.add_argument("--out", help="write the steer/speed outputs to this CSV")
+    parser.add_argument("--compare", help="compare the outputs against a CSV from another build")
+    args = parser.parse_args()
+
+    commands = ReplayEngine(args.session).run()
+    print("replayed %d frames" % len(commands))
+
+    if args.out:
+        save_commands(args.out, commands)
+
+    if args.compare:
+        baseline = load_commands(args.compare)
+        differences = compare_commands(baseline, commands)
+        if len(baseline) != len(commands):
+            print("frame count differs: %d vs %d" % (len(baseline), len(commands)))
+        for expected, actual in differences[:20]:
+            print("frame %d: steer/speed %d/%d -> %d/%d" % (expected.frame, expected.steer, expected.speed, actual.steer, actual.speed))
+        print("%d of %d frames differ" % (len(differences), min(len(baseline), len(commands))))
+        if differences or len(baseline) != len(commands):
+            sys.exit(1)
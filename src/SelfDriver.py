@@ -1,18 +1,30 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import copy
 import cv2
 import numpy as np
-from matplotlib import pyplot as plt
+from collections import namedtuple
 import time
 
-from detect.Bump import BumpDetect
-from detect.TrafficLight import TrafficDetect
-from detect.StopLine import StopDetect
+import detect
+import helpers
+from detect.Scheduler import DetectorScheduler
+from Profiler import FrameProfiler
+from FrameContext import FrameLayout, FrameContext
+from DisplayBoard import DisplayBoard
+from Logger import get_logger
 
 # from SensorData import SensorData
-from helpers import *
+from helpers.ImageHelper import ImageHelper
+from helpers.LaneTracker import LaneTracker
+from helpers.LaneEstimator import LaneEstimator
+from helpers.OccupancyGrid import OccupancyGrid
+from helpers.ArHelper import ArMarkerStore
+
+# preprocess 결과: 센서 스냅샷, 버드아이뷰 차선 마스크, 표시판, 프레임 캐시
+PreparedFrame = namedtuple("PreparedFrame", ["snapshot", "mask", "display_board", "context"])
+
+log = get_logger("SelfDriver")
 
 class SelfDriver:
     def __init__(self, config):
@@ -20,13 +32,30 @@ class SelfDriver:
         # constant variables
         self.IMAGE_WIDTH = config.get("image_width")
         self.IMAGE_HEIGHT = config.get("image_height")
+        # 차선 처리 해상도. 줄이면 픽셀 작업이 줄고, 결과 좌표는 IMAGE 해상도 기준으로 되돌려 쓴다.
+        self.WORK_WIDTH = config.get("work_width", self.IMAGE_WIDTH)
+        self.WORK_HEIGHT = config.get("work_height", self.IMAGE_HEIGHT)
+        self.WORK_SCALE_X = float(self.WORK_WIDTH) / self.IMAGE_WIDTH
+        self.WORK_SCALE_Y = float(self.WORK_HEIGHT) / self.IMAGE_HEIGHT
+        # 차선 위치를 읽는 행 (IMAGE 해상도 기준)
+        self.LANE_ROW = 445
         self.IMAGE_OFFSET = config.get("image_offset")
         self.IMAGE_GAP = config.get("image_gap")
-        self.LANE_BIN_THRESHOLD = config.get("lane_bin_threshold")
         self.CAMERA_MATRIX = config.get("camera_matrix")
         self.DISTORTION_COEFFS = config.get("distortion_coeffs")
         self.CANNY_THRESHOLD_LOW = config.get("canny_threshold_low", 80)
         self.CANNY_THRESHOLD_HIGH = config.get("canny_threshold_high", 90)
+        self.FRAME_BUDGET = config.get("frame_budget", 1.0 / 30)
+        # 정지선 검출 방식: "projection" (버드아이뷰 마스크 행 합) 또는 "contour" (예전 ROI 윤곽선)
+        self.STOPLINE_MODE = config.get("stopline_mode", "projection")
+        # 화면 없이 돌릴 때는 표시판을 아예 만들지 않는다.
+        self.HEADLESS = config.get("headless", False)
+        # 돌려쓸 표시판 장수 (파이프라인 모드는 단계마다 한장씩 물고 있으므로 여러 장)
+        self.DISPLAY_BUFFERS = config.get("display_buffers", 1)
+        # 시간 제어 동작(주차, 로터리 등)이 쓰는 시계. 재생할 때는 가상 시계를 넣는다.
+        self.clock = config.get("clock", time.time)
+        # 단계별 시간 측정 (기본은 꺼진 프로파일러)
+        self.profiler = config.get("profiler") or FrameProfiler(clock=self.clock)
 
         # 참고: cv2.getOptimalNewCameraMatrix
         # https://docs.opencv.org/3.3.0/dc/dbb/tutorial_py_calibration.html
@@ -47,6 +76,15 @@ class SelfDriver:
         self.DRIVING_STATE_BUMP = 8
         self.DRIVING_STATE_PASSENGER = 9
         self.DRIVING_STATE_ARPARKING = 10
+
+        # 점유 격자 질의 영역 (차 기준 x 앞, y 왼쪽, m)
+        self.LANE_AHEAD = ((0.0, 0.25), (3.0, 0.25), (3.0, -0.25), (0.0, -0.25))
+        # 앞 장애물로 볼 거리(m)와 최소 점유 칸 수. 예전 lidar_front 는 평균 거리의 약 2배를 돌려줘서
+        # "< 2.2" 가 실제로는 1.1m 쯤이었다. 칸 하나는 라이다 점 하나로도 차므로 여러 칸을 요구한다.
+        self.OBSTACLE_DISTANCE = 1.1
+        self.OBSTACLE_MIN_CELLS = 3
+        # 주차 공간 앞의 AR 마커 id
+        self.PARKING_MARKER = 0
         
         
         self.driving_state = 2
@@ -57,138 +95,231 @@ class SelfDriver:
         self.sensor_data = None
         self.display_board = None
         self.image_helper = ImageHelper()
-        self.lidar_helper = LidarHelper.LidarHelper()
-        self.ultra_helper = UltraHelper()
-        self.ar_helper = ArHelper()
-        self.stop_detect = StopDetect()
-        self.traffic_detect = TrafficDetect()
-        self.bump_detect = BumpDetect()
+        # 표시판용 헬퍼는 화면이 있을 때만, 차선 변경용 헬퍼는 처음 쓸 때 불러온다.
+        self.lidar_helper = None if self.HEADLESS else helpers.load("LidarHelper")()
+        self.ultra_helper = None if self.HEADLESS else helpers.load("UltraHelper")()
+        self.scanline_helper = None
+        sx, sy = self.WORK_SCALE_X, self.WORK_SCALE_Y
+        self.lane_tracker = LaneTracker((self.WORK_WIDTH, self.WORK_HEIGHT), lane_width=int(130 * sx), window_margin=int(50 * sx), track_margin=int(30 * sx), min_pixels=max(int(30 * sx * sy), 5), row_step=max(int(round(2 * sy)), 1))
+        self.occupancy = OccupancyGrid()
+        self.ar_markers = ArMarkerStore(clock=self.clock)
+        # 검출기는 주행 상태가 처음 필요로 할 때 만든다. (load_* 참고)
+        self.stop_detect = None
+        self.stop_line = None
+        self.lane_mask = None
+        self.traffic_detect = None
+        self.bump_detect = None
         self.last_center = 300
+        # 차선 중앙/방향 추정 (프레임 사이 시각의 조향을 외삽할 때 쓴다)
+        self.lane_estimator = LaneEstimator(self.last_center, clock=self.clock)
+        # 마지막으로 확정한 결정 (steer, speed, 차선 중앙을 따라가는 조향인지, 그때의 추정기 상태)
+        # decide 가 낸 결정은 pending_command 에 두었다가 commit_command 로 확정한다.
+        self.pending_command = (0, 0, False)
+        self.command = self.pending_command + (self.lane_estimator.state,)
         self.count = 0
         self.arNum = -1
         self.dist = -1
         self.start_time = 0
-        self.lidar_front = 100
+        self.obstacle_ahead = 100
+        self.lidar_seq = 0
+        self.ar_seq = 0
+        self.new_scan = False
         self.cnt_right = 0
 
-    def get_next_direction(self, sensor_data):
+        # undistort + crop + resize + 원근 변환을 합친 remap 테이블 (시작할 때 한번만 계산)
+        image_size = (self.IMAGE_WIDTH, self.IMAGE_HEIGHT)
+        undistort_map = self.image_helper.build_undistort_map(self.CAMERA_MATRIX, self.DISTORTION_COEFFS, self.OPTIMAL_CAMERA_MATRIX, self.OPTIMAL_CAMERA_ROI, image_size)
+        work_size = (self.WORK_WIDTH, self.WORK_HEIGHT)
+        self.WARP_MINV, warp_map = self.image_helper.build_warp_map(undistort_map, image_size, work_size)
+        warp_valid_mask = self.image_helper.build_valid_mask(warp_map, image_size, max(int(round(9 * sx)), 1))
+        lane_kernels = (max(int(9 * sx) | 1, 3), max(int(round(4 * sx)), 1))
+
+        # 검출기 ROI 는 원본에서 바로 보정한다. 겹치는 ROI 는 한번에 보정, 변환해서 나눠 쓴다.
+        # ROI 는 검출기를 불러올 때 하나씩 더한다.
+        self.frame_layout = FrameLayout(self.image_helper, undistort_map, self.image_helper.fix_map(warp_map), warp_valid_mask, (self.CANNY_THRESHOLD_LOW, self.CANNY_THRESHOLD_HIGH), lane_kernels=lane_kernels)
+        self.context = None
+        self.display = None if self.HEADLESS else DisplayBoard(self.ultra_helper, self.lidar_helper, (self.IMAGE_WIDTH, self.IMAGE_HEIGHT), self.DISPLAY_BUFFERS)
+
+        # 상태별 검출기 스케줄 (상태, 주기, 1회 시간 예산)
+        # 정지선은 신호등이 안 보일 때만 본다.
+        no_traffic_light = lambda detected: not detected["traffic_light"]
+        self.frame_deadline = None
+        self.detectors = DetectorScheduler(self.clock)
+        self.detectors.register("traffic_light", self.detect_traffic_light, states=(2,), every=1, budget=0.008, default=False, load=self.load_traffic_light)
+        if self.STOPLINE_MODE == "projection":
+            self.detectors.register("stop_line", self.detect_stop_line, states=(2,), every=1, budget=0.001, default=False, load=self.load_stop_line, when=no_traffic_light)
+        else:
+            self.detectors.register("stop_line", self.detect_stop_line, states=(2,), every=2, budget=0.005, default=False, load=self.load_stop_line, when=no_traffic_light)
+        self.detectors.register("bump", self.detect_bump, states=(8,), hz=15, budget=0.005, default=False, load=self.load_bump)
 
-        # copy sensor deeply to make them synchronized throughout this function
-        self.sensor_data = copy.deepcopy(sensor_data)
+    def get_next_direction(self, sensor_data, commit=True):
 
-        # check correct image size
-        if self.sensor_data.image is None:
-            return 0, 0
-        if not self.sensor_data.image.size == (640 * 480 * 3):
+        # take a consistent snapshot of the sensors without copying pixel data
+        frame = self.preprocess(sensor_data.snapshot())
+        if frame is None:
             return 0, 0
 
-        image_size = (self.IMAGE_WIDTH, self.IMAGE_HEIGHT)
-        image_dilated, image_undistorted = self.image_helper.img_processing(self.sensor_data.image, self.CAMERA_MATRIX, self.DISTORTION_COEFFS, self.OPTIMAL_CAMERA_MATRIX, self.OPTIMAL_CAMERA_ROI, image_size, self.CANNY_THRESHOLD_LOW, self.CANNY_THRESHOLD_HIGH)
+        return self.decide(frame, commit)
+
+    def preprocess(self, snapshot):
+        """
+        센서 스냅샷 -> 차선 마스크, 표시판
+        드라이버 상태를 바꾸지 않으므로 decide 와 다른 스레드에서 돌려도 된다.
+        """
 
-        # perspective tranform
-        Minv, warped = self.image_helper.warp_image(image_dilated, self.LANE_BIN_THRESHOLD)
+        # check correct image size
+        if snapshot.image is None:
+            return None
+        if not snapshot.image.shape == (self.IMAGE_HEIGHT, self.IMAGE_WIDTH, 3):
+            return None
+
+        # 원본 -> 버드아이뷰 remap 한번으로 처리한 뒤 차선 엣지 검출
+        context = FrameContext(self.frame_layout, snapshot.image)
+        with self.profiler.phase("warp"):
+            context.warped()
+        with self.profiler.phase("preprocessing"):
+            warped = context.lane_mask()
         # cv2.imshow('warped2', warped)
-        warped = cv2.cvtColor(warped,cv2.COLOR_GRAY2BGR)
+        if self.HEADLESS:
+            return PreparedFrame(snapshot, warped, None, context)
 
+        # 표시판은 늘 IMAGE 해상도 (그 위에 그리는 좌표가 모두 IMAGE 기준)
         # show lidar in display_board
-        if self.sensor_data.ranges:
-            display_lidar = self.lidar_helper.lidar_visualizer(warped, self.sensor_data.ranges_left, self.sensor_data.ranges_right)
-            self.display_board = display_lidar
-            self.lidar_front = self.lidar_helper.lidar_front(self.sensor_data.ranges)
-        else:
-            print("no lidar_msg")
+        with self.profiler.phase("display"):
+            display_board = self.display.begin(warped, snapshot.lidar)
+
+        return PreparedFrame(snapshot, warped, display_board, context)
+
+    def to_work(self, x):
+        """
+        IMAGE 해상도 x 좌표 -> 작업 해상도
+        """
+        return int(round(x * self.WORK_SCALE_X))
+
+    def from_work(self, x):
+        """
+        작업 해상도 x 좌표 -> IMAGE 해상도
+        """
+        return int(round(x / self.WORK_SCALE_X))
+
+    def decide(self, frame, commit=True):
+        """
+        전처리된 프레임으로 상태 머신을 돌려서 steer, speed 결정
+        commit 이 False 면 결정을 확정하지 않는다. (프레임을 검사한 뒤 commit_command / discard_command)
+        """
+
+        self.sensor_data = frame.snapshot
+        self.display_board = frame.display_board
+        self.context = frame.context
+        self.frame_deadline = self.clock() + self.FRAME_BUDGET
+
+        if self.sensor_data.lidar is None:
+            log.warn("no lidar_msg")
+
+        # 카메라가 라이다보다 빠르니 새 스캔이 왔을 때만 격자에 합친다.
+        self.new_scan = self.sensor_data.lidar is not None and self.sensor_data.lidar_seq != self.lidar_seq
+        if self.new_scan:
+            with self.profiler.phase("lidar"):
+                self.lidar_seq = self.sensor_data.lidar_seq
+                self.occupancy.update(self.sensor_data.lidar)
+                self.obstacle_ahead = self.occupancy.nearest_in_polygon(self.LANE_AHEAD, 100, self.OBSTACLE_MIN_CELLS)
             
-        if self.sensor_data.ar:
-            self.arNum, self.dist = self.ar_helper.ArData(self.sensor_data.ar)
-            print("arNum", self.arNum, "dist", self.dist)
-
-        steer, speed = self.drive(warped, image_undistorted)
+        # AR 메시지도 새로 왔을 때만 마커 표에 합친다.
+        if self.sensor_data.ar is not None and self.sensor_data.ar_seq != self.ar_seq:
+            with self.profiler.phase("ar"):
+                self.ar_seq = self.sensor_data.ar_seq
+                self.ar_markers.update(self.sensor_data.ar, self.sensor_data.ar_frame.stamp)
+            arNum, dist = self.ar_markers.nearest()
+            if arNum is not None:
+                self.arNum, self.dist = arNum, dist
+                log.debug("arNum %s dist %s", self.arNum, self.dist)
+
+        with self.profiler.phase("drive"):
+            steer, speed = self.drive(frame.mask)
+        if commit:
+            self.commit_command()
 
         # show ultra in display_board
-        if self.sensor_data.ultra:
-            image_size = (self.IMAGE_WIDTH, self.IMAGE_HEIGHT)
-            display_ultra = self.ultra_helper.ultra_get(image_size, self.sensor_data.ultra)
-            self.display_board = cv2.vconcat([self.display_board, display_ultra])
-        else:
-            print("no ultra_msg")
+        if not self.sensor_data.ultra:
+            log.warn("no ultra_msg")
+        elif not self.HEADLESS:
+            with self.profiler.phase("ultrasonic"):
+                self.display.draw_ultra(self.display_board, self.sensor_data.ultra)
 
+        self.profiler.frame_done(self.sensor_data.image_frame.stamp)
         return steer, speed
 
 
-    def drive(self, image, image_undistorted):
-        #cv2.imshow("image",image)
-        print("state", self.driving_state)
-        lpos, rpos = -1, -1
-        for i in range(self.last_center, 640):
-            if image[445][i][0] > 0:
-                rpos = i
-                break
-        for i in range(self.last_center, -1, -1):
-            if image[445][i][0] > 0:
-                lpos = i
-                break
-
-        if lpos == -1 or rpos == -1:
-            if rpos != -1:
-                lpos = rpos -130
-            elif lpos != -1:
-                rpos = lpos + 130
-            else:
-                for i in range(self.last_center, 640):
-                    if image[450][i][0] > 0:
-                        rpos = i
-                        break
-                else:
-                    rpos = 640
+    def load_traffic_light(self):
+        self.traffic_detect = detect.load("TrafficTracker")()
+        self.frame_layout.add_roi("traffic_light", self.traffic_detect.roi_rect(self.IMAGE_WIDTH))
 
-                for i in range(self.last_center, -1, -1):
-                    if image[450][i][0] > 0:
-                        lpos = i
-                        break
-                else:
-                    lpos = 0
+    def load_stop_line(self):
+        if self.STOPLINE_MODE == "projection":
+            sx, sy = self.WORK_SCALE_X, self.WORK_SCALE_Y
+            self.stop_line = detect.load("StopLineProjector")((self.WORK_WIDTH, self.WORK_HEIGHT), top=int(250 * sy), bottom=int(470 * sy), half_width=int(50 * sx), min_rows=max(int(round(3 * sy)), 1))
+        else:
+            self.stop_detect = detect.load("StopDetect")()
+            self.frame_layout.add_roi("stop_line", self.stop_detect.roi_rect(self.IMAGE_WIDTH))
 
+    def load_bump(self):
+        self.bump_detect = detect.load("BumpDetect")()
+        self.frame_layout.add_roi("bump", self.bump_detect.roi_rect(self.IMAGE_WIDTH))
 
-        # new_img = cv2.line(image,(0,445),(640,445), (0,0,255), 2)
-        image.mean(axis=2)
+    def detect_traffic_light(self):
+        return self.traffic_detect.traf_det_context(self.context)
 
-        #480,640,3
+    def detect_stop_line(self):
+        if self.STOPLINE_MODE == "projection":
+            return self.stop_line.update(self.lane_mask, self.to_work(self.last_center))
 
-        if rpos - lpos < 10:
-            lpos, rpos = 220, 380
+        img, stopline_detected = self.stop_detect.stopline_det_context(self.context)
+        return stopline_detected
 
-        elif rpos -lpos < 100:
-            rpos = lpos + 130
+    def detect_bump(self):
+        return self.bump_detect.bump_det_context(self.context)
 
-        elif rpos - lpos > 600:
-            lpos, rpos = 350, 520
+    def drive(self, image):
+        #cv2.imshow("image",image)
+        log.info("state %d", self.driving_state)
+        # image 는 작업 해상도 버드아이뷰 차선 마스크 한 채널
+        # 차선 위치는 작업 해상도에서 찾고, 아래 상태 머신은 IMAGE 해상도(640x480) 좌표로 돌린다.
+        self.lane_mask = image
+        self.lane_tracker.update(image, self.to_work(self.last_center))
+        lpos, rpos = self.lane_tracker.lane_positions(int(self.LANE_ROW * self.WORK_SCALE_Y), self.to_work(self.last_center))
+        lpos, rpos = self.from_work(lpos), self.from_work(rpos)
+        lane_jump = False
+
+        # new_img = cv2.line(image,(0,445),(640,445), (0,0,255), 2)
 
         #########
         if self.driving_state == 0:
-            llpos = -1
-            for i in range(lpos - 50,-1,-1):
-                if image[200][i][0] > 0:
-                    llpos = i
-                    break
-            print("llpos", llpos)
+            if self.scanline_helper is None:
+                self.scanline_helper = helpers.load("ScanlineHelper")()
+            llpos = int(self.scanline_helper.find_left(image, [int(200 * self.WORK_SCALE_Y)], self.to_work(lpos - 50))[0])
+            if llpos != -1:
+                llpos = self.from_work(llpos)
+            log.debug("llpos %d", llpos)
             if 130>lpos - llpos >110 and llpos != -1 and self.count > 10:
                 rpos = lpos
                 lpos = llpos
-                print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+                self.lane_tracker.reset()
+                lane_jump = True
+                log.info("left lane found at %d, changing lanes", llpos)
                 self.driving_state = 1
-                self.start_time = time.time()
+                self.start_time = self.clock()
                 self.count = 0
         elif self.driving_state == 1 and self.sensor_data.ultra != None:
-            print("ultra message")
-            print(self.sensor_data.ultra[4], self.sensor_data.ultra[5])
+            log.debug("ultra %d %d", self.sensor_data.ultra[4], self.sensor_data.ultra[5])
 
           
             if self.sensor_data.ultra[4] <40 or self.sensor_data.ultra[5] < 40 and self.count > 10:
-                print("!!!!!!!!!!!!!!!!!!!!!!!!!!")
+                log.info("obstacle beside the car, back to the first lane")
                 lpos, rpos = 300,400
+                lane_jump = True
                 self.driving_state = 0
                 self.count = 0
-            if time.time() - start_time >15:
+            if self.clock() - self.start_time >15:
                 self.driving_state = 2
 
 
@@ -204,36 +335,37 @@ class SelfDriver:
         #############
 
         self.last_center = (rpos+lpos) // 2
+        self.update_lane_estimate(lane_jump)
         steer = int((self.last_center-300) // 2)
+        # 아래 상태에서 조향을 고정값으로 바꾸면 False (SteeringLoop 가 차선 외삽으로 덮어쓰지 않게)
+        follows_lane = True
         speed = 15
         
 
+        # 지금 상태에서 돌 차례인 검출기만 돌리고 나머지는 캐시된 결과 사용
+        with self.profiler.phase("detectors"):
+            detected = self.detectors.update(self.driving_state, self.frame_deadline)
+
         if self.driving_state == 2:
-            #img, stopline_detected = self.stop_detect.stopline_det(image_undistorted)
-            #cv2.imshow("img",img)
-            #if stopline_detected:
-                #angle = 0
-                #speed = 0
-                #print("stop line detected")
-            traffic_sign = self.traffic_detect.traf_det(image_undistorted)
+            traffic_sign = detected["traffic_light"]
             if not traffic_sign:
-                img, stopline_detected = self.stop_detect.stopline_det(image_undistorted)
+                stopline_detected = detected["stop_line"]
                 if stopline_detected:
                     angle = 0
                     speed = 0
-                    print("stop line detected")
+                    log.info("stop line detected, distance %s", self.stop_line and self.stop_line.distance and self.stop_line.distance / self.WORK_SCALE_Y)
                     
             else:
                 self.driving_state = 4
-                self.start_time = time.time()
+                self.start_time = self.clock()
                 
                 
                 
 #        elif self.driving_state ==3:
-#            if time.time()-self.start_time < 3:
+#            if self.clock()-self.start_time < 3:
 #                speed = 15
 #                angle = 0
-#            elif time.time()-self.start_time < 6:
+#            elif self.clock()-self.start_time < 6:
 #                speed = 15
 #                angle = 50
 #            else:
@@ -242,53 +374,62 @@ class SelfDriver:
 
 
 
-        if self.arNum == 0 and self.dist < 0.6 and self.driving_state == 4:
+        parking_dist = self.ar_markers.distance(self.PARKING_MARKER)
+        if self.driving_state == 4 and parking_dist is not None and parking_dist < 0.6:
 
             self.driving_state = 5
-            self.start_time = time.time()
+            self.start_time = self.clock()
         elif self.driving_state == 5:
             t = 2.5
-            if time.time() - self.start_time < t-0.1:
+            if self.clock() - self.start_time < t-0.1:
                 speed = 15
                 steer = 50
-            elif time.time() - self.start_time < t + 1:
+                follows_lane = False
+            elif self.clock() - self.start_time < t + 1:
                 speed = 0
                 steeer = 0
-            elif time.time() - self.start_time < 1.8*t + 1:
+            elif self.clock() - self.start_time < 1.8*t + 1:
                 speed = -20
                 steer = -50
-            elif time.time() - self.start_time < 2.3* t + 1:
+                follows_lane = False
+            elif self.clock() - self.start_time < 2.3* t + 1:
                 speed = -20
                 steer = 50
+                follows_lane = False
             else:
-                if self.dist > 0.8:
+                # 주차 마커에서 0.8m 멀어질 때까지 후진 (시야에서 사라지면 마지막으로 본 거리로)
+                if self.ar_markers.last_distance(self.PARKING_MARKER, 0) > 0.8:
                     self.driving_state = 6
-                    self.start_time = time.time()
+                    self.start_time = self.clock()
                 else:
                     speed = -20
                     steer = 0
+                    follows_lane = False
         elif self.driving_state == 6:
             speed = 0
             steer = 0
-            if 4 > time.time() - self.start_time > 3:
+            follows_lane = False
+            if 4 > self.clock() - self.start_time > 3:
                 speed = 15
                 steer = -20
-            elif 8> time.time() - self.start_time > 4:
+            elif 8> self.clock() - self.start_time > 4:
                 speed = 15
                 steer = -40
-            elif time.time() - self.start_time > 8:
+            elif self.clock() - self.start_time > 8:
                 self.driving_state = 7
-                self.start_time = time.time()
+                self.start_time = self.clock()
                 self.last_center = 200
+                self.lane_tracker.reset()
+                self.lane_estimator.reset(self.last_center, stamp=self.frame_stamp())
         
         elif self.driving_state == 7:
-            if time.time() - self.start_time > 60:
+            if self.clock() - self.start_time > 60:
                 self.driving_state = 8
-            print("it is yolo state")
+            log.debug("it is yolo state")
 
         elif self.driving_state == 8:
             
-            bump = self.bump_detect.bump_det(image_undistorted)
+            bump = detected["bump"]
             if bump:
                 self.driving_state = 9
 
@@ -297,22 +438,29 @@ class SelfDriver:
         elif self.driving_state == 9:
             speed = 20
             steer = -2
-            if self.lidar_front < 2.2:
+            follows_lane = False
+            if self.obstacle_ahead < self.OBSTACLE_DISTANCE:
                 self.driving_state = 10
-                self.start_time = time.time()
+                self.start_time = self.clock()
         elif self.driving_state == 10:
             speed = 0
             steer = -2
-            self.cnt_right += len([x for x in self.sensor_data.ranges_right if 0 < x < 0.5])
-            if self.cnt_right > 10 and time.time() - self.start_time > 2:
+            follows_lane = False
+            # 오른쪽 0.5m 안의 라이다 점 수를 카메라 프레임마다 더한다. (cnt_right > 10 기준이 이 단위)
+            if self.sensor_data.lidar is not None:
+                self.cnt_right += self.sensor_data.lidar.count_below(270, 360, 0.5)
+            if self.cnt_right > 10 and self.clock() - self.start_time > 2:
                 self.driving_state = 11
-                self.start_time = time.time()
+                self.start_time = self.clock()
                 self.last_center = 300
+                self.lane_tracker.reset()
+                self.lane_estimator.reset(self.last_center, stamp=self.frame_stamp())
                 
         elif self.driving_state == 11:
             speed = 15
-            if time.time() - self.start_time < 3:
+            if self.clock() - self.start_time < 3:
                 steer =20
+                follows_lane = False
             
             
             
@@ -324,40 +472,96 @@ class SelfDriver:
                 self.parallel_count = 0
             if self.parallel_count > 4:
                 self.driving_state = 16
-                self.start_time = time.time()
+                self.start_time = self.clock()
                 
         elif self.driving_state == 16:
-            if time.time() - self.start_time < 3.5:
+            if self.clock() - self.start_time < 3.5:
                 speed = 15
                 steer = 0
-            elif time.time() - self.start_time < 5:
+                follows_lane = False
+            elif self.clock() - self.start_time < 5:
                 speed =-20
                 steer = 50
-            elif time.time() - self.start_time < 6:
+                follows_lane = False
+            elif self.clock() - self.start_time < 6:
                 speed = -20
                 steer = 0    
-            elif time.time() - self.start_time < 7.5:
+                follows_lane = False
+            elif self.clock() - self.start_time < 7.5:
                 speed = -20
                 steer = -50     
+                follows_lane = False
             else:
                 self.driving_state = 17            
         elif self.driving_state == 17:
             speed = 0
             steer = 0
+            follows_lane = False
             
 
-        self.display_board = cv2.line(self.display_board,(self.last_center,445),(self.last_center,445),(255,0,0),30)
-        self.display_board = cv2.line(self.display_board,(lpos,445),(lpos,445),(0,255,0),30)
-        self.display_board = cv2.line(self.display_board,(rpos,445),(rpos,445),(0,255,0),30)
+        if self.display_board is not None:
+            self.display.draw_point(self.display_board, self.last_center, self.LANE_ROW, (255,0,0))
+            self.display.draw_point(self.display_board, lpos, self.LANE_ROW, (0,255,0))
+            self.display.draw_point(self.display_board, rpos, self.LANE_ROW, (0,255,0))
 
 
 
+        self.pending_command = (steer, speed, follows_lane)
         self.count += 1
         return steer, speed
 
+    def commit_command(self):
+        """
+        마지막 decide 결정을 확정해서 steer_command 가 쓰게 한다.
+        """
+
+        self.command = self.pending_command + (self.lane_estimator.state,)
+
+    def discard_command(self):
+        """
+        마지막 decide 결정을 버린다. 그 프레임으로 갱신한 차선 추정도 확정했던 상태로 되돌린다.
+        """
+
+        self.lane_estimator.state = self.command[3]
+
+    def frame_stamp(self):
+        """
+        지금 처리 중인 카메라 프레임을 받은 시각
+        """
+        return self.sensor_data.image_frame.stamp
+
+    def update_lane_estimate(self, lane_jump):
+        """
+        이번 프레임 차선 중앙(last_center)과 방향으로 추정기 갱신
+        차선을 바꿔서 중앙이 건너뛰었으면 새로 시작하고, 차선이 안 보이면 갱신하지 않는다.
+        """
+
+        slope = self.lane_tracker.slope(int(self.LANE_ROW * self.WORK_SCALE_Y))
+        # 작업 해상도 기울기 -> IMAGE 해상도 기울기 -> 도 (오른쪽이 +)
+        heading = None if slope is None else -np.degrees(np.arctan(slope * self.WORK_SCALE_Y / self.WORK_SCALE_X))
+        if lane_jump:
+            self.lane_estimator.reset(self.last_center, heading or 0.0, self.frame_stamp())
+        elif slope is not None:
+            self.lane_estimator.update(self.last_center, heading, self.frame_stamp())
+
+    def steer_command(self, stamp=None):
+        """
+        마지막 결정을 stamp(기본은 지금) 시각에 맞춰 다시 계산한 (steer, speed)
+        차선을 따라가는 중이면 그 시각까지 외삽한 차선 중앙으로 조향한다. (SteeringLoop 가 부른다)
+        """
+
+        steer, speed, follows_lane, lane_state = self.command
+        if follows_lane:
+            center, heading = self.lane_estimator.predict(stamp, lane_state)
+            steer = int((int(center) - 300) // 2)
+        return steer, speed
+
 
     def visualize(self):
 
+        if self.HEADLESS:
+            return
+
         if self.display_board is not None:
             cv2.imshow("Sensor data display board", self.display_board)
 
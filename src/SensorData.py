@@ -1,36 +1,178 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
+import threading
+from collections import namedtuple
+
 import numpy as np
 from cv_bridge import CvBridge
-from helpers.LidarHelper import LidarHelper
+from helpers.LidarScan import LidarScan
+from Recorder import markers_to_rows
 
 bridge = CvBridge()
 
+# 콜백에서 한번에 교체되는 센서 데이터 한 묶음 (data, 순번, 수신시각)
+SensorFrame = namedtuple("SensorFrame", ["data", "seq", "stamp"])
+EMPTY_FRAME = SensorFrame(None, 0, 0.0)
+
+
+class SensorSnapshot(object):
+    """
+    get_next_direction 한번 동안 쓰는 센서 데이터 묶음
+    픽셀 데이터는 복사하지 않고 콜백이 만든 읽기 전용 참조만 들고 있는다.
+    """
+
+    __slots__ = ("image_frame", "lidar_frame", "ultra_frame", "ar_frame", "stamp")
+
+    def __init__(self, image_frame, lidar_frame, ultra_frame, ar_frame, stamp):
+        self.image_frame = image_frame
+        self.lidar_frame = lidar_frame
+        self.ultra_frame = ultra_frame
+        self.ar_frame = ar_frame
+        self.stamp = stamp
+
+    @property
+    def image(self):
+        return self.image_frame.data
+
+    @property
+    def image_seq(self):
+        return self.image_frame.seq
+
+    @property
+    def image_age(self):
+        return self.stamp - self.image_frame.stamp
+
+    @property
+    def lidar(self):
+        return self.lidar_frame.data
+
+    @property
+    def lidar_seq(self):
+        return self.lidar_frame.seq
+
+    @property
+    def ranges(self):
+        return self.lidar.ranges if self.lidar is not None else None
+
+    @property
+    def ranges_left(self):
+        return self.lidar.left if self.lidar is not None else None
+
+    @property
+    def ranges_right(self):
+        return self.lidar.right if self.lidar is not None else None
+
+    @property
+    def ultra(self):
+        return self.ultra_frame.data
+
+    @property
+    def ar(self):
+        return self.ar_frame.data
+
+    @property
+    def ar_seq(self):
+        return self.ar_frame.seq
+
+
 class SensorData:
-    def __init__(self):
+    def __init__(self, clock=time.time, recorder=None):
 
-        # self.image = np.empty(shape=[0])
-        self.image = None
-        self.ultra = None
-        self.ranges = None
-        self.ranges_left = None
-        self.ranges_right = None
-        self.ar = None
+        # 수신 시각을 재는 시계 (재생할 때는 가상 시계를 넣는다)
+        self.clock = clock
+        # 들어오는 센서 데이터를 파일에 기록 (SessionRecorder)
+        self.recorder = recorder
 
-        self.lidar_helper = LidarHelper()
+        # 각 토픽마다 SensorFrame 하나를 통째로 교체해서 발행한다.
+        # 참조 대입은 원자적이므로 읽는 쪽은 락 없이 일관된 값을 본다.
+        self.image_frame = EMPTY_FRAME
+        self.lidar_frame = EMPTY_FRAME
+        self.ultra_frame = EMPTY_FRAME
+        self.ar_frame = EMPTY_FRAME
+
+        # 새 카메라 프레임이 들어오면 기다리는 제어 루프를 깨운다.
+        self.image_ready = threading.Condition()
+        self.closed = False
+
+    @property
+    def image(self):
+        return self.image_frame.data
+
+    def wait_for_image(self, last_seq):
+        """
+        last_seq 보다 새 카메라 프레임이 들어올 때까지 기다렸다가 그 순번을 돌려준다.
+        close() 되면 None
+
+        타임아웃 없이 기다린다. (파이썬 2 의 Condition.wait(timeout) 은 폴링이라 지연이 생긴다)
+        """
+
+        with self.image_ready:
+            while self.image_frame.seq == last_seq and not self.closed:
+                self.image_ready.wait()
+            if self.closed:
+                return None
+            return self.image_frame.seq
+
+    def frame_valid(self, snapshot):
+        """
+        SharedSensorReader.frame_valid 와 같은 약속. 프레임을 통째로 바꿔 끼우므로 늘 유효하다.
+        """
+        return True
+
+    def close(self):
+        with self.image_ready:
+            self.closed = True
+            self.image_ready.notify_all()
+
+    def snapshot(self):
+        return SensorSnapshot(self.image_frame, self.lidar_frame, self.ultra_frame, self.ar_frame, self.clock())
 
     def image_callback(self, msg):
-        self.image = bridge.imgmsg_to_cv2(msg, "bgr8")
+        self.publish_image(bridge.imgmsg_to_cv2(msg, "bgr8"))
 
     def lidar_callback(self, msg):
-        self.ranges = msg.ranges
-        self.ranges_left = self.ranges[:self.lidar_helper.degree_to_lidar(90.)]
-        self.ranges_right = self.ranges[self.lidar_helper.degree_to_lidar(270.):]
-
+        self.publish_lidar(msg.ranges)
 
     def ultra_callback(self, msg):
-        self.ultra = msg.data
+        self.publish_ultra(msg.data)
 
     def ar_callback(self, msg):
-        self.ar = msg.markers
+        self.publish_ar(msg.markers)
+
+    def publish_image(self, image):
+        stamp = self.clock()
+        if self.recorder is not None:
+            self.recorder.write_image(stamp, image)
+
+        image.flags.writeable = False
+        with self.image_ready:
+            self.image_frame = SensorFrame(image, self.image_frame.seq + 1, stamp)
+            self.image_ready.notify_all()
+
+    def publish_lidar(self, ranges):
+        stamp = self.clock()
+        scan = LidarScan(ranges)
+        if self.recorder is not None:
+            self.recorder.write_lidar(stamp, scan.ranges)
+
+        scan.ranges.flags.writeable = False
+        self.lidar_frame = SensorFrame(scan, self.lidar_frame.seq + 1, stamp)
+
+    def publish_ultra(self, data):
+        stamp = self.clock()
+        if self.recorder is not None:
+            self.recorder.write_ultra(stamp, data)
+
+        self.ultra_frame = SensorFrame(data, self.ultra_frame.seq + 1, stamp)
+
+    def publish_ar(self, markers):
+        # 콜백에서 한번만 (id, x, y, z, qx, qy, qz, qw) 행 배열로 바꿔둔다.
+        stamp = self.clock()
+        rows = markers_to_rows(markers)
+        if self.recorder is not None:
+            self.recorder.write_ar(stamp, rows)
+
+        rows.flags.writeable = False
+        self.ar_frame = SensorFrame(rows, self.ar_frame.seq + 1, stamp)
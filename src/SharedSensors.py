@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ROS 구독 프로세스와 SelfDriver 프로세스가 센서 데이터를 공유 메모리로 주고받기
+
+    구독 프로세스: SharedSensorData 콜백이 받은 데이터를 SensorRing 슬롯에 쓴다.
+    드라이버 프로세스: SharedSensorReader 가 최신 슬롯을 복사 없이 SensorSnapshot 으로 넘긴다.
+
+두 프로세스는 GIL 을 따로 쓰므로 콜백 처리가 제어 루프의 CPU 시간을 뺏지 않는다.
+"""
+
+import os
+import time
+import subprocess
+import multiprocessing
+
+import numpy as np
+
+from SensorData import SensorData, SensorFrame, SensorSnapshot, EMPTY_FRAME
+from Recorder import AR_FIELDS
+from helpers.LidarScan import LidarScan
+from Logger import get_logger
+
+log = get_logger("SharedSensors")
+
+
+class SensorRing:
+    """
+    고정 크기 슬롯 slots 개짜리 공유 메모리 링 버퍼 (슬롯 하나에 배열 하나)
+
+    슬롯마다 헤더(순번, 수신시각, 첫 축 길이)가 있다. 쓰는 쪽은 슬롯 순번을 0 으로 지우고
+    데이터와 헤더를 쓴 다음 순번을 적고, 마지막에 latest 를 올린다.
+    헤더는 양쪽 모두 lock 을 잡고 읽고 쓴다. 데이터는 lock 밖에서 쓰고 읽지만, lock 을 잡고 놓을 때
+    메모리 장벽이 들어가므로 ARM 처럼 저장 순서가 바뀌는 CPU 에서도 순번이 데이터보다 먼저 보이지
+    않는다. lock 은 헤더 몇 칸 동안만 잡으므로 쓰는 쪽이 오래 기다리는 일은 없다.
+    읽는 쪽은 latest 슬롯을 복사 없이 view 로 받는다. 그 슬롯은 쓰는 쪽이 slots - 1 번 더
+    쓰기 전까지는 그대로이므로, 다 쓴 뒤 valid(seq) 로 덮어쓰이지 않았는지 확인해야 한다.
+    오래 들고 있을 작은 배열은 copy=True 로 읽는다. 복사한 뒤 순번을 다시 확인하므로
+    돌려받은 데이터는 섞이지 않은 한 프레임이다.
+    """
+
+    def __init__(self, shape, dtype, slots=4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.slot_size = int(np.prod(self.shape))
+
+        self.buffer = multiprocessing.RawArray("B", self.slot_size * self.dtype.itemsize * slots)
+        self.seqs = multiprocessing.RawArray("L", slots)
+        self.stamps = multiprocessing.RawArray("d", slots)
+        self.lengths = multiprocessing.RawArray("i", slots)
+        self.latest = multiprocessing.RawValue("L", 0)
+        self.lock = multiprocessing.Lock()
+        self.views = None
+
+    def slot_views(self):
+        # 프로세스마다 처음 쓸 때 한번만 numpy view 를 만든다.
+        if self.views is None:
+            data = np.frombuffer(self.buffer, self.dtype).reshape((self.slots,) + self.shape)
+            self.views = list(data)
+        return self.views
+
+    def write(self, data, stamp):
+        data = np.asarray(data, self.dtype)
+        length = len(data) if data.ndim else 1
+        if data.shape[1:] != self.shape[1:] or length > self.shape[0]:
+            return False
+
+        with self.lock:
+            seq = self.latest.value + 1
+            index = seq % self.slots
+            self.seqs[index] = 0
+        self.slot_views()[index][:length] = data
+        with self.lock:
+            self.stamps[index] = stamp
+            self.lengths[index] = length
+            self.seqs[index] = seq
+            self.latest.value = seq
+        return True
+
+    def read(self, last_seq=None, copy=False):
+        """
+        최신 슬롯 SensorFrame, last_seq 그대로면 None
+        data 는 copy 면 복사본, 아니면 공유 메모리 view (다 쓴 뒤 valid 로 확인)
+        """
+
+        # 읽는 도중 그 슬롯을 덮어썼으면 더 새 슬롯으로 다시 읽는다.
+        for _ in range(self.slots):
+            with self.lock:
+                seq = self.latest.value
+                if seq == 0 or seq == last_seq:
+                    return None
+                index = seq % self.slots
+                length = self.lengths[index]
+                stamp = self.stamps[index]
+                if self.seqs[index] != seq:
+                    continue
+
+            view = self.slot_views()[index][:length]
+            if copy:
+                view = view.copy()
+                if not self.valid(seq):
+                    continue
+            view.flags.writeable = False
+            return SensorFrame(view, seq, stamp)
+        return None
+
+    def valid(self, seq):
+        with self.lock:
+            return self.seqs[seq % self.slots] == seq
+
+
+class SharedSensors:
+    """
+    토픽별 SensorRing 묶음과 새 카메라 프레임 알림 (fork 전에 만든다)
+    """
+
+    def __init__(self, image_shape=(480, 640, 3), lidar_size=1024, ultra_size=8, max_markers=16, slots=4, image_slots=8):
+        # 카메라 프레임은 복사 없이 처리하므로 느린 프레임 동안 덮어쓰이지 않게 슬롯을 넉넉히 둔다.
+        self.image = SensorRing(image_shape, np.uint8, image_slots)
+        self.lidar = SensorRing((lidar_size,), np.float32, slots)
+        self.ultra = SensorRing((ultra_size,), np.int32, slots)
+        self.ar = SensorRing((max_markers, AR_FIELDS), np.float64, slots)
+        self.image_ready = multiprocessing.Condition()
+        self.closed = multiprocessing.RawValue("b", 0)
+
+    def notify_image(self):
+        with self.image_ready:
+            self.image_ready.notify_all()
+
+    def close(self):
+        with self.image_ready:
+            self.closed.value = 1
+            self.image_ready.notify_all()
+
+
+class SharedSensorData(SensorData):
+    """
+    구독 프로세스 쪽 SensorData: 평소처럼 발행(기록 포함)하고 공유 메모리에도 쓴다.
+    """
+
+    def __init__(self, shared, clock=time.time, recorder=None):
+        SensorData.__init__(self, clock, recorder)
+        self.shared = shared
+
+    def publish_image(self, image):
+        SensorData.publish_image(self, image)
+        frame = self.image_frame
+        if self.shared.image.write(frame.data, frame.stamp):
+            self.shared.notify_image()
+        else:
+            log.warn("camera frame %s does not fit the shared slot", frame.data.shape)
+
+    def publish_lidar(self, ranges):
+        SensorData.publish_lidar(self, ranges)
+        frame = self.lidar_frame
+        if not self.shared.lidar.write(frame.data.ranges, frame.stamp):
+            log.warn("lidar scan of %d ranges does not fit the shared slot", len(frame.data))
+
+    def publish_ultra(self, data):
+        SensorData.publish_ultra(self, data)
+        frame = self.ultra_frame
+        if not self.shared.ultra.write(frame.data, frame.stamp):
+            log.warn("ultrasonic message of %d values does not fit the shared slot", len(frame.data))
+
+    def publish_ar(self, markers):
+        SensorData.publish_ar(self, markers)
+        frame = self.ar_frame
+        rows = frame.data
+        capacity = self.shared.ar.shape[0]
+        if len(rows) > capacity:
+            # 다 못 넣으면 통째로 버리지 않고 가까운 마커부터 슬롯 크기만큼 넘긴다. (주차 마커는 가까이 있다)
+            log.warn("%d AR markers do not fit the shared slot, keeping the nearest %d", len(rows), capacity)
+            rows = rows[np.argsort(np.hypot(rows[:, 1], rows[:, 3]))[:capacity]]
+        if not self.shared.ar.write(rows, frame.stamp):
+            log.warn("AR markers %s do not fit the shared slot", rows.shape)
+
+
+class SharedSensorReader:
+    """
+    드라이버 프로세스 쪽: SelfDriver.get_next_direction 과 main 루프가 쓰는 SensorData 자리에 넣는다.
+    """
+
+    def __init__(self, shared, clock=time.time):
+        self.shared = shared
+        self.clock = clock
+
+        self.image_frame = EMPTY_FRAME
+        self.lidar_frame = EMPTY_FRAME
+        self.ultra_frame = EMPTY_FRAME
+        self.ar_frame = EMPTY_FRAME
+
+    @property
+    def image(self):
+        self.refresh_image()
+        return self.image_frame.data
+
+    def refresh_image(self):
+        frame = self.shared.image.read(self.image_frame.seq)
+        if frame is not None:
+            self.image_frame = frame
+
+    def refresh(self):
+        # 라이다, 초음파, AR 은 여러 프레임 동안 들고 있으므로 새 순번일 때만 복사해서 변환한다.
+        self.refresh_image()
+
+        frame = self.shared.lidar.read(self.lidar_frame.seq, copy=True)
+        if frame is not None:
+            self.lidar_frame = SensorFrame(LidarScan(frame.data), frame.seq, frame.stamp)
+
+        frame = self.shared.ultra.read(self.ultra_frame.seq, copy=True)
+        if frame is not None:
+            self.ultra_frame = SensorFrame(tuple(frame.data.tolist()), frame.seq, frame.stamp)
+
+        frame = self.shared.ar.read(self.ar_frame.seq, copy=True)
+        if frame is not None:
+            self.ar_frame = frame
+
+    def snapshot(self):
+        self.refresh()
+        return SensorSnapshot(self.image_frame, self.lidar_frame, self.ultra_frame, self.ar_frame, self.clock())
+
+    def frame_valid(self, snapshot):
+        """
+        snapshot 의 카메라 프레임 슬롯이 아직 덮어쓰이지 않았는지 (처리를 다 끝낸 뒤 확인)
+        """
+        return self.shared.image.valid(snapshot.image_seq)
+
+    def wait_for_image(self, last_seq):
+        """
+        SensorData.wait_for_image 와 같은 약속. 닫히면 None
+        """
+
+        with self.shared.image_ready:
+            while self.shared.image.latest.value == last_seq and not self.shared.closed.value:
+                self.shared.image_ready.wait()
+        if self.shared.closed.value:
+            return None
+        self.refresh_image()
+        return self.image_frame.seq
+
+    def close(self):
+        self.shared.close()
+
+
+def pin_to_cpus(cpus, name):
+    """
+    현재 프로세스를 cpus 코어에만 돌게 하기
+
+    파이썬 2 에는 os.sched_setaffinity 가 없으므로 taskset (util-linux) 으로 건다.
+    """
+
+    if not cpus:
+        return
+    cpus = sorted(cpus)
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    else:
+        try:
+            subprocess.check_call(["taskset", "-pc", ",".join(str(cpu) for cpu in cpus), str(os.getpid())], stdout=open(os.devnull, "w"))
+        except (OSError, subprocess.CalledProcessError) as e:
+            log.warn("%s: could not pin to CPUs %s (%s)", name, cpus, e)
+            return
+    log.info("%s pinned to CPUs %s", name, cpus)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+from Logger import get_logger
+
+log = get_logger("SteeringLoop")
+
+
+class SteeringLoop(threading.Thread):
+    """
+    인식 속도와 상관없이 hz 주기로 모터 명령을 발행하는 스레드
+
+    인식 루프는 driver.decide 로 결정만 갱신하고, 이 스레드가 주기마다
+    driver.steer_command(지금) 으로 그 시각의 조향을 다시 계산해서 publish 한다.
+    프레임이 늦거나 버려져도 명령은 같은 간격으로 나가고, 조향은 추정한 차선을 따라 부드럽게 움직인다.
+    """
+
+    def __init__(self, driver, publish, hz, clock=time.time):
+        threading.Thread.__init__(self, name="steering")
+        self.daemon = True
+        self.driver = driver
+        self.publish = publish
+        self.period = 1.0 / hz
+        self.clock = clock
+        self.stopped = threading.Event()
+        self.late = 0
+
+    def run(self):
+        next_time = time.time()
+        while not self.stopped.is_set():
+            steer, speed = self.driver.steer_command(self.clock())
+            self.publish(steer, speed)
+
+            # 주기를 놓치면 밀린 만큼 몰아서 보내지 않고 지금부터 다시 센다.
+            next_time += self.period
+            remaining = next_time - time.time()
+            if remaining > 0:
+                self.stopped.wait(remaining)
+            else:
+                self.late += 1
+                log.warn("steering loop is %.1f ms late (%d times)", -remaining * 1000, self.late)
+                next_time = time.time()
+
+    def stop(self):
+        self.stopped.set()
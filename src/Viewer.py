@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import socket
+import threading
+import time
+import multiprocessing
+
+import cv2
+import numpy as np
+
+
+class SharedFrame:
+    """
+    프로세스 사이에서 이미지 한장을 공유하는 버퍼
+
+    쓰는 쪽은 락을 못 잡으면 그 프레임을 그냥 버린다. (제어 루프는 절대 기다리지 않는다)
+    """
+
+    def __init__(self, max_shape=(960, 640, 3)):
+        self.max_size = int(np.prod(max_shape))
+        self.buffer = multiprocessing.RawArray("B", self.max_size)
+        self.height = multiprocessing.RawValue("i", 0)
+        self.width = multiprocessing.RawValue("i", 0)
+        self.seq = multiprocessing.RawValue("L", 0)
+        self.lock = multiprocessing.Lock()
+
+    def write(self, image):
+        if image is None or image.size > self.max_size:
+            return False
+        if not self.lock.acquire(False):
+            return False
+
+        try:
+            height, width = image.shape[:2]
+            pixels = np.frombuffer(self.buffer, np.uint8, count=image.size)
+            pixels[:] = image.reshape(-1)
+            self.height.value = height
+            self.width.value = width
+            self.seq.value += 1
+        finally:
+            self.lock.release()
+        return True
+
+    def read(self, last_seq):
+        """
+        last_seq 이후 새 이미지가 있으면 (seq, 복사본), 없으면 (last_seq, None)
+        """
+
+        if self.seq.value == last_seq:
+            return last_seq, None
+
+        with self.lock:
+            height, width = self.height.value, self.width.value
+            pixels = np.frombuffer(self.buffer, np.uint8, count=height * width * 3)
+            return self.seq.value, pixels.reshape(height, width, 3).copy()
+
+
+class MjpegServer(threading.Thread):
+    """
+    localhost 포트로 접속한 브라우저/ffplay 에 MJPEG 스트림 보내기
+    """
+
+    BOUNDARY = "frame"
+
+    def __init__(self, port, host="127.0.0.1"):
+        threading.Thread.__init__(self, name="mjpeg")
+        self.daemon = True
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(2)
+        self.clients = []
+        self.clients_lock = threading.Lock()
+
+    def run(self):
+        while True:
+            client, _ = self.server.accept()
+            try:
+                client.recv(1024)
+                client.sendall(("HTTP/1.0 200 OK\r\n"
+                                "Cache-Control: no-cache\r\n"
+                                "Content-Type: multipart/x-mixed-replace; boundary=%s\r\n\r\n" % self.BOUNDARY).encode("ascii"))
+            except socket.error:
+                client.close()
+                continue
+
+            with self.clients_lock:
+                self.clients.append(client)
+
+    def send(self, jpeg):
+        header = ("--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % (self.BOUNDARY, len(jpeg))).encode("ascii")
+
+        with self.clients_lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(header + jpeg + b"\r\n")
+                except socket.error:
+                    client.close()
+                    self.clients.remove(client)
+
+
+def run_viewer(shared_frame, mode, hz, port, quality):
+    """
+    뷰어 프로세스 본체: 공유 버퍼를 hz 주기로 확인해서 창에 띄우거나 MJPEG 로 보낸다.
+    """
+
+    server = None
+    if mode == "mjpeg":
+        server = MjpegServer(port)
+        server.start()
+
+    seq = 0
+    period = 1.0 / hz
+    while True:
+        started = time.time()
+
+        seq, image = shared_frame.read(seq)
+        if image is not None:
+            if server is not None:
+                ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if ok:
+                    server.send(jpeg.tobytes())
+            else:
+                cv2.imshow("Sensor data display board", image)
+
+        if server is None:
+            cv2.waitKey(1)
+
+        remaining = period - (time.time() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class Viewer:
+    """
+    표시판을 별도 프로세스에서 그리기
+    제어 루프는 publish 로 공유 메모리에 복사만 하고 바로 돌아간다.
+    """
+
+    def __init__(self, mode="window", hz=10, port=8090, quality=70):
+        self.shared_frame = SharedFrame()
+        self.process = multiprocessing.Process(target=run_viewer, name="viewer", args=(self.shared_frame, mode, hz, port, quality))
+        self.process.daemon = True
+        self.period = 1.0 / hz
+        self.last_publish = 0
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def publish(self, display_board):
+        # 뷰어가 어차피 hz 로만 읽으니 그보다 자주 복사할 필요가 없다.
+        now = time.time()
+        if now - self.last_publish < self.period:
+            return False
+        if not self.shared_frame.write(display_board):
+            return False
+        self.last_publish = now
+        return True
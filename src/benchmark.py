@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+인식 파이프라인 단계별 지연시간 벤치마크 (고정된 640x480 입력)
+
+    python benchmark.py                          # 결과만 출력
+    python benchmark.py --save baseline.json     # 기준값 저장
+    python benchmark.py --compare baseline.json  # 기준보다 느려진 단계가 있으면 exit 1
+"""
+
+import sys
+import copy
+import json
+import time
+import argparse
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from SensorData import SensorData
+from SelfDriver import SelfDriver
+from FrameContext import FrameContext
+from DriverConfig import default_config
+from helpers.ImageHelper import ImageHelper
+from helpers.LidarHelper import LidarHelper
+from helpers.UltraHelper import UltraHelper
+from detect.TrafficLight import TrafficDetect, TrafficTracker
+from detect.StopLine import StopDetect, StopLineProjector
+from detect.Bump import BumpDetect
+
+PERCENTILES = (50, 90, 99)
+
+
+def make_frame(seed=0):
+    """
+    차선 두개, 정지선, 신호등 박스가 있는 합성 카메라 프레임
+    """
+
+    rng = np.random.RandomState(seed)
+    frame = np.full((480, 640, 3), 90, np.uint8)
+    frame += rng.randint(0, 20, frame.shape).astype(np.uint8)
+
+    cv2.line(frame, (180, 479), (270, 260), (230, 230, 230), 12)
+    cv2.line(frame, (470, 479), (380, 260), (230, 230, 230), 12)
+    cv2.rectangle(frame, (200, 330), (440, 345), (230, 230, 230), -1)
+    cv2.rectangle(frame, (280, 110), (350, 135), (20, 20, 20), -1)
+    cv2.circle(frame, (338, 122), 7, (60, 220, 60), -1)
+    return frame
+
+
+def make_scan(seed=0):
+    rng = np.random.RandomState(seed)
+    ranges = rng.uniform(0.2, 3.0, 505).astype(np.float32)
+    ranges[rng.rand(505) < 0.1] = 0
+    return ranges
+
+
+# drive 가 프레임마다 바꾸는 SelfDriver 안의 객체들
+DRIVER_STATE = ("lane_tracker", "lane_estimator", "ar_markers", "occupancy", "traffic_detect", "stop_line", "stop_detect", "bump_detect")
+
+
+def restore_point(driver):
+    """
+    지금 driver 상태로 되돌리는 함수 (drive 를 매번 같은 상태에서 재기 위해)
+    """
+
+    attributes = dict(driver.__dict__)
+    parts = dict((name, copy.deepcopy(getattr(driver, name).__dict__)) for name in DRIVER_STATE if getattr(driver, name) is not None)
+    scheduler = dict(driver.detectors.__dict__)
+    tasks = [dict(task.__dict__) for task in driver.detectors.tasks]
+
+    def restore():
+        driver.__dict__.update(attributes)
+        for name, state in parts.items():
+            getattr(driver, name).__dict__.update(copy.deepcopy(state))
+        driver.detectors.__dict__.update(scheduler)
+        for task, state in zip(driver.detectors.tasks, tasks):
+            task.__dict__.update(state)
+    return restore
+
+
+def build_stages(frame, scan, ultra, work_size=None):
+    config = default_config()
+    if work_size:
+        config["work_width"], config["work_height"] = work_size
+    size = (config["image_width"], config["image_height"])
+
+    image_helper = ImageHelper()
+    camera_matrix = config["camera_matrix"]
+    distortion_coeffs = config["distortion_coeffs"]
+    optimal_camera_matrix, optimal_camera_roi = cv2.getOptimalNewCameraMatrix(camera_matrix, distortion_coeffs, size, 1, size)
+
+    image_dilated, image_undistorted = image_helper.img_processing(frame, camera_matrix, distortion_coeffs, optimal_camera_matrix, optimal_camera_roi, size, 80, 90)
+
+    sensor_data = SensorData()
+    sensor_data.publish_image(frame.copy())
+    sensor_data.publish_lidar(scan)
+    sensor_data.publish_ultra(ultra)
+
+    driver = SelfDriver(config)
+    driver.detectors.load_all()
+    prepared = driver.preprocess(sensor_data.snapshot())
+
+    def drive():
+        driver.sensor_data = prepared.snapshot
+        driver.display_board = prepared.display_board
+        driver.context = prepared.context
+        driver.frame_deadline = None
+        return driver.drive(prepared.mask)
+
+    # drive 는 상태(프레임 수, 차선 곡선, 주행 상태, 검출기 주기 등)를 바꾸므로
+    # 한 프레임 돌려서 차선 추적 중인 상태를 만든 뒤, 매번 그 상태로 되돌리고 잰다. (되돌리는 시간은 재지 않는다)
+    drive()
+    restore_drive = restore_point(driver)
+
+    lidar_helper = LidarHelper()
+    board = cv2.cvtColor(prepared.mask, cv2.COLOR_GRAY2BGR)
+    ultra_helper = UltraHelper()
+    traffic_detect = TrafficDetect()
+    traffic_tracker = TrafficTracker()
+    stop_detect = StopDetect()
+    stop_line = StopLineProjector()
+    bump_detect = BumpDetect()
+
+    ultra_changed = [ultra, tuple(value + 1 for value in ultra)]
+
+    def draw_ultra():
+        # 값이 매번 바뀌는 경우 (같은 값이면 다시 그리지 않는다)
+        ultra_changed.reverse()
+        driver.display.draw_ultra(prepared.display_board, ultra_changed[0])
+
+    # SelfDriver 는 쓰는 검출기 ROI 만 가지고 있으니 여기서 비교할 세 검출기 ROI 를 더한다.
+    for name, detector in (("traffic_light", traffic_tracker), ("stop_line", stop_detect), ("bump", bump_detect)):
+        driver.frame_layout.add_roi(name, detector.roi_rect(size[0]))
+
+    def detect_all(context):
+        # 세 검출기가 한 프레임 캐시를 같이 쓸 때
+        traffic_tracker.traf_det_context(context)
+        stop_detect.stopline_det_context(context)
+        bump_detect.bump_det_context(context)
+
+    stages = OrderedDict()
+    stages["ImageHelper.img_processing"] = lambda: image_helper.img_processing(frame, camera_matrix, distortion_coeffs, optimal_camera_matrix, optimal_camera_roi, size, 80, 90)
+    stages["ImageHelper.warp_image"] = lambda: image_helper.warp_image(image_dilated, 130)
+    stages["SelfDriver.preprocess"] = lambda: driver.preprocess(prepared.snapshot)
+    stages["SelfDriver.drive"] = (drive, restore_drive)
+    stages["TrafficDetect.traf_det"] = lambda: traffic_detect.traf_det(image_undistorted)
+    stages["TrafficTracker.traf_det"] = lambda: traffic_tracker.traf_det(image_undistorted)
+    stages["StopDetect.stopline_det"] = lambda: stop_detect.stopline_det(image_undistorted)
+    stages["StopLineProjector.update"] = lambda: stop_line.update(prepared.mask, 300)
+    stages["BumpDetect.bump_det"] = lambda: bump_detect.bump_det(image_undistorted)
+    stages["FrameContext.detectors"] = lambda: detect_all(FrameContext(driver.frame_layout, frame))
+    stages["LidarHelper.lidar_visualizer"] = lambda: lidar_helper.lidar_visualizer(board, prepared.snapshot.ranges_left, prepared.snapshot.ranges_right)
+    stages["UltraHelper.ultra_get"] = lambda: ultra_helper.ultra_get(size, ultra)
+    stages["DisplayBoard.begin"] = lambda: driver.display.begin(prepared.mask, prepared.snapshot.lidar)
+    stages["DisplayBoard.draw_ultra"] = draw_ultra
+    return stages
+
+
+def measure(func, iterations, warmup, setup=None):
+    """
+    setup 이 있으면 매번 func 전에 부른다. (시간에 넣지 않음)
+    """
+
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        if setup is not None:
+            setup()
+        started = time.time()
+        func()
+        samples[i] = time.time() - started
+
+    samples *= 1000.0
+    result = OrderedDict(("p%d" % p, float(np.percentile(samples, p))) for p in PERCENTILES)
+    result["mean"] = float(samples.mean())
+    result["max"] = float(samples.max())
+    return result
+
+
+def compare(baseline, results, tolerance, slack):
+    """
+    p50 가 기준보다 tolerance 비율 + slack(ms) 이상 느려진 단계 목록
+    """
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        limit = baseline[name]["p50"] * (1.0 + tolerance) + slack
+        if result["p50"] > limit:
+            regressions.append((name, baseline[name]["p50"], result["p50"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="per-stage latency benchmark for the perception pipeline")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--stage", action="append", help="only run stages whose name contains this text")
+    parser.add_argument("--image", help="use this 640x480 image instead of the synthetic frame")
+    parser.add_argument("--work-size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="SelfDriver lane processing resolution")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail if a stage is slower than this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown ratio")
+    parser.add_argument("--slack", type=float, default=0.05, help="allowed absolute p50 slowdown in ms")
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image) if args.image else make_frame()
+    if frame is None or frame.shape != (480, 640, 3):
+        parser.error("the benchmark needs a 640x480 BGR image")
+    stages = build_stages(frame, make_scan(), (30, 0, 0, 0, 30, 30, 30, 30), args.work_size)
+
+    results = OrderedDict()
+    print("%-32s %9s %9s %9s %9s" % ("stage (ms)", "p50", "p90", "p99", "max"))
+    for name, stage in stages.items():
+        if args.stage and not any(text in name for text in args.stage):
+            continue
+        # 단계는 func 또는 (func, setup)
+        func, setup = stage if isinstance(stage, tuple) else (stage, None)
+        result = measure(func, args.iterations, args.warmup, setup)
+        results[name] = result
+        print("%-32s %9.3f %9.3f %9.3f %9.3f" % (name, result["p50"], result["p90"], result["p99"], result["max"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance, args.slack)
+        for name, before, after in regressions:
+            print("REGRESSION %s: p50 %.3f ms -> %.3f ms" % (name, before, after))
+        if regressions:
+            sys.exit(1)
@@ -5,6 +5,9 @@ import numpy as np
 import cv2
 
 class BumpDetect:
+    # x_len, start_y, offset_y
+    ROI = (250, 230, 80)
+
     def __init__(self):
         pass
 
@@ -22,14 +25,35 @@ class BumpDetect:
         end_x = int(width -start_x)
         return frame[start_y:start_y+offset_y, start_x-50:end_x-50], start_x, start_y
 
+    def roi_rect(self, width):
+        """
+        set_roi_color_bump 가 잘라내는 영역 (x0, y0, x1, y1)
+        """
+        x_len, start_y, offset_y = self.ROI
+        start_x = int(width/2 - (x_len/2))
+        end_x = int(width -start_x)
+        return start_x-50, start_y, end_x-50, start_y + offset_y
+
     def bump_det(self, image):
+        x_len, start_y, offset_y = self.ROI
+        sign_roi,_,_ = self.set_roi_color_bump(image,x_len,start_y,offset_y)
+        return self.bump_det_roi(sign_roi)
+
+    def bump_det_roi(self, sign_roi):
         """
         방지턱 인식하기 
         """
 
-        sign_roi,_,_ = self.set_roi_color_bump(image,250,230,80)
         H,L,S = cv2.split(cv2.cvtColor(sign_roi,cv2.COLOR_BGR2HLS))
+        return self.bump_det_lightness(L, sign_roi)
+
+    def bump_det_context(self, context, name="bump"):
+        """
+        FrameContext 의 HLS ROI 로 검출 (공유 이미지라 라벨은 그리지 않는다)
+        """
+        return self.bump_det_lightness(context.hls(name)[:, :, 1])
 
+    def bump_det_lightness(self, L, sign_roi=None):
         _,L = cv2.threshold(L,200,255, cv2.THRESH_BINARY)
         #print (L)
 
@@ -45,7 +69,8 @@ class BumpDetect:
             approx = cv2.approxPolyDP(cont, cv2.arcLength(cont,True) *0.02, True)
             vtc = len(approx)
             if vtc ==6:
-                self.setLabel(sign_roi, cont, 'bump')
+                if sign_roi is not None:
+                    self.setLabel(sign_roi, cont, 'bump')
                 return True
         return False
     
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*-coding:utf-8-*-
+
+import time
+
+class DetectorTask:
+    def __init__(self, name, func, states, every, hz, budget, default, load, when):
+        self.name = name
+        self.func = func
+        self.load = load
+        self.when = when
+        self.loaded = load is None
+        self.load_time = 0.0
+        self.states = set(states)
+        self.every = every
+        self.period = 1.0 / hz if hz else None
+        self.budget = budget
+        self.default = default
+
+        self.result = default
+        self.last_frame = None
+        self.last_time = None
+        self.cost = 0.0
+        self.backoff = 1
+        self.deferred = 0
+
+    def reset(self):
+        self.result = self.default
+        self.last_frame = None
+        self.last_time = None
+        self.backoff = 1
+        self.deferred = 0
+
+    def is_due(self, frame, now):
+        if self.last_frame is None:
+            return True
+        if self.period is not None:
+            return now - self.last_time >= self.period * self.backoff
+        return frame - self.last_frame >= self.every * self.backoff
+
+
+class DetectorScheduler:
+    """
+    주행 상태마다 어떤 검출기를 얼마나 자주 돌릴지 정하고 결과를 캐시해두기
+
+    - every: N 프레임마다 한번, hz: 초당 목표 횟수 (hz 가 있으면 hz 우선)
+    - budget: 한번 돌 때 허용 시간(초). 넘기면 주기를 두배로 늘리고, 여유가 생기면 다시 줄인다.
+    - update 에 deadline 을 주면 이번 프레임 남은 시간이 모자랄 때 다음 프레임으로 미룬다.
+    - load: 검출기를 만드는 함수. 처음 켜지는 상태가 될 때 한번만 부른다. (시작을 빠르게)
+    - when: 이번 프레임에 먼저 나온 {이름: 결과} 를 받아 돌릴지 정하는 함수. False 면 돌리지 않고
+      기본값을 준다. (예: 신호등이 보이는 동안은 정지선을 안 본다. 먼저 등록한 검출기 결과만 보인다)
+    """
+
+    MAX_BACKOFF = 8
+    MAX_DEFER = 3
+    COST_SMOOTHING = 0.3
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.tasks = []
+        self.frame = 0
+        self.state = None
+
+    def register(self, name, func, states, every=1, hz=None, budget=None, default=None, load=None, when=None):
+        self.tasks.append(DetectorTask(name, func, states, every, hz, budget, default, load, when))
+
+    def update(self, state, deadline=None):
+        """
+        현재 상태에서 켜져야 하는 검출기 중 돌 차례인 것만 돌리고
+        {이름: 결과} 를 돌려준다. 이번에 안 돈 검출기는 마지막 결과를 그대로 준다.
+        """
+
+        self.frame += 1
+        results = {}
+
+        for task in self.tasks:
+            if state not in task.states:
+                if state != self.state:
+                    task.reset()
+                continue
+
+            # 새로 켜진 검출기는 예전 상태의 결과를 쓰면 안된다.
+            if self.state not in task.states:
+                task.reset()
+            if task.when is not None and not task.when(results):
+                # 꺼져 있는 동안의 결과는 없는 것으로, 다시 켜지면 바로 돈다.
+                task.reset()
+                results[task.name] = task.result
+                continue
+            if not task.loaded:
+                self.load(task)
+
+            now = self.clock()
+            if task.is_due(self.frame, now):
+                if deadline is not None and now + task.cost > deadline and task.deferred < self.MAX_DEFER:
+                    task.deferred += 1
+                else:
+                    self.run(task, now)
+
+            results[task.name] = task.result
+
+        self.state = state
+        return results
+
+    def load(self, task):
+        started = self.clock()
+        task.load()
+        task.load_time = self.clock() - started
+        task.loaded = True
+
+    def load_all(self):
+        """
+        아직 안 불러온 검출기를 모두 지금 불러오기 (벤치마크 등 미리 준비해야 할 때)
+        """
+
+        for task in self.tasks:
+            if not task.loaded:
+                self.load(task)
+
+    def run(self, task, now):
+        task.result = task.func()
+        cost = self.clock() - now
+
+        task.cost += self.COST_SMOOTHING * (cost - task.cost)
+        task.last_frame = self.frame
+        task.last_time = now
+        task.deferred = 0
+
+        if task.budget is not None:
+            if cost > task.budget:
+                task.backoff = min(task.backoff * 2, self.MAX_BACKOFF)
+            elif task.backoff > 1:
+                task.backoff //= 2
+
+    def result(self, name):
+        for task in self.tasks:
+            if task.name == name:
+                return task.result
+        return None
@@ -3,11 +3,16 @@
 
 import numpy as np
 import cv2
+from Logger import get_logger
+
+log = get_logger("StopDetect")
 
 class StopDetect:
     frame = None
     Width = 640
     Height = 480
+    # x_len, start_y, offset_y
+    ROI = (350, 280, 80)
 
     def __init__(self):
         pass
@@ -31,11 +36,32 @@ class StopDetect:
         end_x = int(width - start_x)
         return frame[start_y:start_y+offset_y, start_x-50:end_x-50], start_x, start_y
 
+    def roi_rect(self, width):
+        """
+        set_roi_color_stop 가 잘라내는 영역 (x0, y0, x1, y1)
+        """
+        x_len, start_y, offset_y = self.ROI
+        start_x = int(width/2 - (x_len/2))
+        end_x = int(width - start_x)
+        return start_x-50, start_y, end_x-50, start_y + offset_y
+
     def stopline_det(self, image):
+        x_len, start_y, offset_y = self.ROI
+        sign_roi, _, _ = self.set_roi_color_stop(image,x_len,start_y,offset_y)
+        return self.stopline_det_roi(sign_roi)
+
+    def stopline_det_roi(self, sign_roi):
+        return self.stopline_det_gray(cv2.cvtColor(sign_roi, cv2.COLOR_BGR2GRAY), sign_roi)
+
+    def stopline_det_context(self, context, name="stop_line"):
+        """
+        FrameContext 의 흑백 ROI 로 검출 (공유 이미지라 라벨은 그리지 않는다)
+        """
+        return self.stopline_det_gray(context.gray(name))
+
+    def stopline_det_gray(self, gray, sign_roi=None):
         detected = False
  
-        sign_roi, _, _ = self.set_roi_color_stop(image,350,280,80)
-        gray = cv2.cvtColor(sign_roi, cv2.COLOR_BGR2GRAY)
         gray = 255- gray
         k = cv2.getStructuringElement(cv2.MORPH_RECT,(2,2))
         gray = cv2.erode(gray, k)
@@ -72,11 +98,98 @@ class StopDetect:
 
                 cont_xwidth = cont_xmax -cont_xmin
                 cont_ywidth = cont_ymax - cont_ymin
-                print()                
-                print("x, y width", cont_xwidth,cont_ywidth)                                
-                print()
+                log.debug("x, y width %d %d", cont_xwidth, cont_ywidth)
                 if cont_xwidth > 179 and cont_ywidth < 50:
-                    print("x, y width", cont_xwidth,cont_ywidth)                
-                    img = self.setLabel(sign_roi, cont, 'stopline')
+                    log.info("stop line x, y width %d %d", cont_xwidth, cont_ywidth)
+                    if sign_roi is not None:
+                        img = self.setLabel(sign_roi, cont, 'stopline')
                     detected = True
         return img, detected
+
+
+class StopLineProjector:
+    """
+    버드아이뷰 차선 마스크에서 정지선 찾기 (새로 이미지를 만들지 않고 행 합만 본다)
+
+    차 중심 주변 band (차선 폭 130 보다 좁게, 차선은 안 들어오게) 안에서 행마다 켜진 픽셀 비율을 구하고, 비율이 높은 행이
+    min_rows 줄 이상 이어지면 가로 막대(정지선)로 본다. 차선은 세로라서 비율이 낮다.
+    켜질 때는 on_ratio 를 on_frames 번 연속, 꺼질 때는 off_ratio 아래로 off_frames 번 연속
+    내려가야 바뀌어서 한 프레임 흔들림에 상태가 뒤집히지 않는다.
+
+    distance 는 마스크 아래쪽에서 정지선까지 행 수 (meters_per_pixel 을 주면 m)
+    """
+
+    def __init__(self, size=(640, 480), top=250, bottom=470, half_width=50, on_ratio=0.6, off_ratio=0.45, min_rows=3, on_frames=2, off_frames=3, meters_per_pixel=None):
+        self.WIDTH, self.HEIGHT = size
+        self.TOP = top
+        self.BOTTOM = bottom
+        self.HALF_WIDTH = half_width
+        self.ON_RATIO = on_ratio
+        self.OFF_RATIO = off_ratio
+        self.MIN_ROWS = min_rows
+        self.ON_FRAMES = on_frames
+        self.OFF_FRAMES = off_frames
+        self.METERS_PER_PIXEL = meters_per_pixel
+
+        self.detected = False
+        self.streak = 0
+        self.row = None
+        self.distance = None
+
+    def reset(self):
+        self.detected = False
+        self.streak = 0
+        self.row = None
+        self.distance = None
+
+    def find_bar(self, mask, center, ratio):
+        """
+        band 안에서 가장 아래(가까운) 가로 막대의 아래쪽 행, 없으면 None
+        막대 위치는 늘 off_ratio 로 잡고, 막대의 가장 꽉 찬 행이 ratio 를 넘어야 인정한다.
+        """
+
+        x0 = max(int(center) - self.HALF_WIDTH, 0)
+        x1 = min(int(center) + self.HALF_WIDTH, self.WIDTH)
+        if x1 - x0 < self.HALF_WIDTH:
+            return None
+
+        band = mask[self.TOP:self.BOTTOM, x0:x1]
+        profile = cv2.reduce(band, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() / (255.0 * (x1 - x0))
+        full = profile >= self.OFF_RATIO
+        if not full.any():
+            return None
+
+        # 연속된 행 묶음 중 min_rows 이상인 것, 아래쪽부터
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], full.astype(np.int8), [0]))))
+        starts, ends = edges[0::2], edges[1::2]
+        for start, end in zip(starts[::-1], ends[::-1]):
+            if end - start >= self.MIN_ROWS and profile[start:end].max() >= ratio:
+                return self.TOP + end - 1
+        return None
+
+    def update(self, mask, center):
+        """
+        이번 프레임 마스크로 상태 갱신, 정지선 상태(bool) 반환
+        """
+
+        row = self.find_bar(mask, center, self.OFF_RATIO if self.detected else self.ON_RATIO)
+        if (row is not None) != self.detected:
+            self.streak += 1
+            if self.streak >= (self.OFF_FRAMES if self.detected else self.ON_FRAMES):
+                self.detected = not self.detected
+                self.streak = 0
+        else:
+            self.streak = 0
+
+        if row is not None:
+            self.row = row
+            self.distance = self.HEIGHT - row
+            if self.METERS_PER_PIXEL is not None:
+                self.distance *= self.METERS_PER_PIXEL
+        elif not self.detected:
+            self.row = None
+            self.distance = None
+
+        if row is not None and self.detected:
+            log.debug("stop line row %d distance %s", row, self.distance)
+        return self.detected
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 # -*-coding:utf-8-*-
 
+from collections import deque
+
 import numpy as np
 import cv2
+from Logger import get_logger
+
+log = get_logger("TrafficDetect")
 
 class TrafficDetect:
     frame = None
+    # x_len, start_y, offset_y
+    ROI = (200, 80, 100)
     
     def __init__(self):
         pass
@@ -24,9 +31,22 @@ class TrafficDetect:
         end_x = int(width - start_x)
         return frame[start_y:start_y+offset_y, start_x:end_x], start_x, start_y
 
+    def roi_rect(self, width):
+        """
+        set_roi_color_traf 가 잘라내는 영역 (x0, y0, x1, y1)
+        """
+        x_len, start_y, offset_y = self.ROI
+        start_x = int(width/2 - (x_len/2))
+        end_x = int(width - start_x)
+        return start_x, start_y, end_x, start_y + offset_y
+
     def traf_det(self, image):
+        x_len, start_y, offset_y = self.ROI
+        sign_roi,_,_ = self.set_roi_color_traf(image,x_len,start_y,offset_y)
+        return self.traf_det_roi(sign_roi)
+
+    def traf_det_roi(self, sign_roi):
         ##불켜진 상태에서 신호등 사각형 찾기
-        sign_roi,_,_ = self.set_roi_color_traf(image,200,80,100)
         H,L,S = cv2.split(cv2.cvtColor(sign_roi,cv2.COLOR_BGR2HLS))
         L = 255-L
         _,L = cv2.threshold(L,130,255, cv2.THRESH_BINARY)
@@ -78,7 +98,7 @@ class TrafficDetect:
                     #print(cont_x_width, cont_y_width)
                     self.setLabel(sign_roi, cont, 'traf_Box')
                     (x,y,w,h) = cv2.boundingRect(cont)  
-                    print (x,y,w,h)
+                    log.debug("box %d %d %d %d", x, y, w, h)
                     roi2 = sign_roi[y:y+h,x:x+w].copy()
                     hsv = cv2.cvtColor(roi2, cv2.COLOR_BGR2HSV)  
                     h, s, v = cv2.split(hsv)
@@ -96,17 +116,16 @@ class TrafficDetect:
                             #원의 중심 좌표 -10에서 +10까지하면 한변 길이 20짜리 정사각형 생김
                             #그 원의 v성분 값을 cr_img로 저장함. 
                         
-                            img_str = 'x: {0}, y: {1}, mean : {2}'.format(i[0],i[1], cr_img.mean())
                             #좌표값, v성분들의 평균값mean()을  구함
-                            print(img_str) 
+                            log.debug("x: %d, y: %d, mean : %.1f", i[0], i[1], cr_img.mean())
                             if 13> i[0] >3:
-                                print "Red"
+                                log.info("light %s", "Red")
                                 return False
                             elif 30>i[0] > 15 and i[0] < 85:
-                                print "Yellow"
+                                log.info("light %s", "Yellow")
                                 return False
                             elif  i[0] >35 :
-                                print "Green"
+                                log.info("light %s", "Green")
                                 return True
                         
                     except AttributeError:
@@ -115,4 +134,137 @@ class TrafficDetect:
                     
         
         #return  cimg
-        return False
\ No newline at end of file
+        return False
+
+
+class TrafficTracker(TrafficDetect):
+    """
+    신호등 박스를 한번 찾으면 다음 프레임부터는 그 주변 작은 창에서만 따라가기
+
+    박스를 못 찾은 상태에서만 ROI 전체를 검색하고, lost_frames 번 연속 놓치면 다시 전체 검색한다.
+    색은 HoughCircles 없이 박스를 가로로 3등분한 칸(왼쪽부터 빨강, 노랑, 초록)의
+    밝은 픽셀 수로 정하고, 최근 votes 프레임의 다수결로 확정한다.
+    """
+
+    COLORS = ("Red", "Yellow", "Green")
+
+    def __init__(self, margin=12, votes=5, lost_frames=3, bright=200, min_lit=6):
+        TrafficDetect.__init__(self)
+        self.MARGIN = margin
+        self.LOST_FRAMES = lost_frames
+        self.BRIGHT = bright
+        self.MIN_LIT = min_lit
+
+        self.box = None
+        self.lost = 0
+        self.votes = deque(maxlen=votes)
+        self.color = None
+
+    def reset(self):
+        self.box = None
+        self.lost = 0
+        self.votes.clear()
+        self.color = None
+
+    def dark_mask(self, L):
+        # 불 꺼진 신호등 몸체 (TrafficDetect.traf_det_roi 와 같은 HLS 밝기 기준)
+        _, mask = cv2.threshold(L, 125, 255, cv2.THRESH_BINARY_INV)
+        return mask
+
+    def housing_size(self, w, h):
+        return 100 > w > 40 and 50 > h > 15
+
+    def search(self, L):
+        """
+        ROI 전체에서 신호등 박스 (x, y, w, h) 찾기, 여러개면 가장 큰 것
+        """
+
+        _, contours, _ = cv2.findContours(self.dark_mask(L), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        best = None
+        for cont in contours:
+            approx = cv2.approxPolyDP(cont, cv2.arcLength(cont, True) * 0.02, True)
+            if len(approx) != 4:
+                continue
+            x, y, w, h = cv2.boundingRect(cont)
+            if self.housing_size(w, h) and (best is None or w * h > best[2] * best[3]):
+                best = (x, y, w, h)
+        return best
+
+    def track(self, L):
+        """
+        이전 박스 주변 창에서만 박스 다시 찾기, 중심이 가장 가까운 것
+        """
+
+        x, y, w, h = self.box
+        height, width = L.shape[:2]
+        x0, y0 = max(x - self.MARGIN, 0), max(y - self.MARGIN, 0)
+        x1, y1 = min(x + w + self.MARGIN, width), min(y + h + self.MARGIN, height)
+
+        _, contours, _ = cv2.findContours(self.dark_mask(L[y0:y1, x0:x1]), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        center_x, center_y = x + w / 2.0, y + h / 2.0
+        best = None
+        best_distance = None
+        for cont in contours:
+            bx, by, bw, bh = cv2.boundingRect(cont)
+            if not self.housing_size(bw, bh):
+                continue
+            distance = abs(x0 + bx + bw / 2.0 - center_x) + abs(y0 + by + bh / 2.0 - center_y)
+            if best is None or distance < best_distance:
+                best = (x0 + bx, y0 + by, bw, bh)
+                best_distance = distance
+        return best
+
+    def classify(self, sign_roi):
+        """
+        박스 안 세 칸 중 밝은 픽셀이 가장 많은 칸 -> 색 번호, 불이 없으면 None
+        """
+
+        x, y, w, h = self.box
+        # HSV 의 V 는 BGR 중 최대값
+        v = sign_roi[y:y + h, x:x + w].max(axis=2)
+        columns = np.count_nonzero(v > self.BRIGHT, axis=0)
+
+        cell = w // 3
+        lit = [int(columns[i * cell:(i + 1) * cell].sum()) for i in range(3)]
+        best = int(np.argmax(lit))
+        if lit[best] < self.MIN_LIT:
+            return None
+        return best
+
+    def vote(self, color):
+        self.votes.append(color)
+        counts = [self.votes.count(i) for i in range(3)]
+        best = int(np.argmax(counts))
+        if counts[best] > len(self.votes) // 2:
+            self.color = self.COLORS[best]
+        return self.color
+
+    def traf_det_roi(self, sign_roi):
+        """
+        초록불로 확정되면 True (TrafficDetect.traf_det_roi 와 같은 약속)
+        """
+
+        return self.update(sign_roi, cv2.cvtColor(sign_roi, cv2.COLOR_BGR2HLS)[:, :, 1])
+
+    def traf_det_context(self, context, name="traffic_light"):
+        """
+        FrameContext 에 이미 있는 ROI 와 HLS 를 그대로 쓰기
+        """
+
+        return self.update(context.roi(name), context.hls(name)[:, :, 1])
+
+    def update(self, sign_roi, L):
+        found = self.track(L) if self.box is not None else self.search(L)
+        if found is None:
+            if self.box is not None:
+                self.lost += 1
+                if self.lost >= self.LOST_FRAMES:
+                    log.debug("traffic light lost")
+                    self.reset()
+            return self.color == "Green"
+
+        self.box = found
+        self.lost = 0
+        color = self.vote(self.classify(sign_roi))
+        log.info("light %s", color)
+        return color == "Green"
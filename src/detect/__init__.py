@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+"""
+검출기 진입점 (이름 -> "모듈:속성")
+
+SelfDriver 는 주행 상태가 처음 그 검출기를 필요로 할 때 load 해서 만든다. (DetectorScheduler 의 load)
+"""
+
+from Registry import Registry
+
+registry = Registry({
+    "BumpDetect": "detect.Bump:BumpDetect",
+    "StopDetect": "detect.StopLine:StopDetect",
+    "StopLineProjector": "detect.StopLine:StopLineProjector",
+    "TrafficDetect": "detect.TrafficLight:TrafficDetect",
+    "TrafficTracker": "detect.TrafficLight:TrafficTracker",
+})
+
+
+def load(name):
+    return registry.load(name)
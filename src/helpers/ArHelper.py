@@ -1,33 +1,108 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import cv2
-import numpy as np
-from tf.transformations import euler_from_quaternion
+import time
 import math
 
+import numpy as np
+
 
 class ArHelper:
     def __init__(self):
         pass
-    
+
     def ArData(self,data):
-        arData = {}
-        
+        """
+        첫번째 마커의 (id, 거리) (예전 방식, ArMarkerStore 를 쓰는 게 낫다)
+        """
+
         for i in data:
-            arNum = i. id
-            
-            arData["DX"] = i.pose.pose.position.x
-            arData["DY"] = i.pose.pose.position.y
-            arData["DZ"] = i.pose.pose.position.z
-            
-            arData["AX"] = i.pose.pose.orientation.x
-            arData["AY"] = i.pose.pose.orientation.y
-            arData["AZ"] = i.pose.pose.orientation.z
-            arData["AW"] = i.pose.pose.orientation.w
-            _,pitch,_ = euler_from_quaternion((arData["AX"],arData["AY"],arData["AZ"], arData["AW"]))
-            pitch = math.degrees(pitch) * -1
-            dist = math.sqrt(pow(arData["DX"], 2) + pow(arData["DZ"], 2))
-            
-            
-            return arNum, dist
\ No newline at end of file
+            position = i.pose.pose.position
+            return i.id, math.sqrt(position.x * position.x + position.z * position.z)
+
+
+class ArMarkerStore:
+    """
+    AR 마커 id 로 바로 찾는 배열 표 (id 0 ~ max_id-1)
+
+    SensorData 가 메시지 하나를 (id, x, y, z, qx, qy, qz, qw) 행 배열로 바꿔두면
+    update 가 모든 마커를 한번에 표에 넣는다. 거리와 방향(pitch, 도)은 마커마다
+    지수 평균으로 부드럽게 하고, expiry 초 동안 안 보인 마커는 없는 것으로 본다.
+    """
+
+    def __init__(self, max_id=32, alpha=0.5, expiry=1.0, clock=time.time):
+        self.MAX_ID = max_id
+        self.ALPHA = alpha
+        self.EXPIRY = expiry
+        self.clock = clock
+
+        self.distances = np.zeros(max_id)
+        self.headings = np.zeros(max_id)
+        self.stamps = np.full(max_id, -np.inf)
+        self.nearest_id = None
+
+    def update(self, rows, stamp):
+        """
+        rows: (N, 8) 마커 행 배열, stamp: 메시지 수신 시각
+        """
+
+        rows = np.asarray(rows, np.float64).reshape(-1, 8)
+        ids = rows[:, 0].astype(np.int32)
+        known = (ids >= 0) & (ids < self.MAX_ID)
+        if not known.any():
+            return
+        rows, ids = rows[known], ids[known]
+
+        x, z = rows[:, 1], rows[:, 3]
+        qx, qy, qz, qw = rows[:, 4], rows[:, 5], rows[:, 6], rows[:, 7]
+        distance = np.sqrt(x * x + z * z)
+        # tf euler_from_quaternion (sxyz) 의 pitch 를 부호 바꿔서 도 단위로
+        heading = -np.degrees(np.arcsin(np.clip(2 * (qw * qy - qx * qz), -1, 1)))
+
+        # 최근에 본 마커만 이전 값과 섞고, 오래된 마커는 새 값으로 다시 시작
+        recent = stamp - self.stamps[ids] <= self.EXPIRY
+        self.distances[ids] = np.where(recent, self.distances[ids] + self.ALPHA * (distance - self.distances[ids]), distance)
+        self.headings[ids] = np.where(recent, self.headings[ids] + self.ALPHA * (heading - self.headings[ids]), heading)
+        self.stamps[ids] = stamp
+
+        self.nearest_id = self.find_nearest()
+
+    def fresh(self, marker_id):
+        return 0 <= marker_id < self.MAX_ID and self.clock() - self.stamps[marker_id] <= self.EXPIRY
+
+    def distance(self, marker_id, default=None):
+        return float(self.distances[marker_id]) if self.fresh(marker_id) else default
+
+    def last_distance(self, marker_id, default=None):
+        """
+        마지막으로 본 거리 (오래됐어도 그대로), 한번도 못 봤으면 default
+        마커가 시야에서 사라진 뒤에도 마지막 거리로 판단해야 하는 동작(주차 후진)에 쓴다.
+        """
+
+        if not 0 <= marker_id < self.MAX_ID or self.stamps[marker_id] == -np.inf:
+            return default
+        return float(self.distances[marker_id])
+
+    def heading(self, marker_id, default=None):
+        return float(self.headings[marker_id]) if self.fresh(marker_id) else default
+
+    def visible(self):
+        return np.flatnonzero(self.clock() - self.stamps <= self.EXPIRY)
+
+    def find_nearest(self):
+        fresh = self.clock() - self.stamps <= self.EXPIRY
+        if not fresh.any():
+            return None
+        return int(np.where(fresh, self.distances, np.inf).argmin())
+
+    def nearest(self):
+        """
+        가장 가까운 마커 (id, 거리), 없으면 (None, None)
+        update 때 구해둔 값이 아직 유효하면 그대로 쓴다.
+        """
+
+        if self.nearest_id is None or not self.fresh(self.nearest_id):
+            self.nearest_id = self.find_nearest()
+        if self.nearest_id is None:
+            return None, None
+        return self.nearest_id, float(self.distances[self.nearest_id])
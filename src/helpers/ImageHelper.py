@@ -6,7 +6,9 @@ import numpy as np
 
 class ImageHelper:
     def __init__(self):
-        pass
+        # 버드아이뷰 변환 전후 4개 점 좌표
+        self.WARP_SRC_POINTS = np.float32([[216,245],[34,358],[380,245],[535,358]])
+        self.WARP_DST_POINTS = np.float32([[216,245],[216,480],[380,245],[380,480]])
 
     def img_processing(self, image_raw, camera_matrix, distortion_coeffs, optimal_camera_matrix, optimal_camera_roi, size, canny_threshold_low, canny_threshold_high):
 
@@ -37,36 +39,136 @@ class ImageHelper:
         #pts1 =np.float32([[228,290],[75,385],[423,290],[573,385]])
         #pts2 =np.float32([[228,290],[228,480],[423,290],[423,480]])
 
-        pts1 = np.float32([[216,245],[34,358],[380,245],[535,358]])
-        pts2 = np.float32([[216,245],[216,480],[380,245],[380,480]])
+        pts1 = self.WARP_SRC_POINTS
+        pts2 = self.WARP_DST_POINTS
 
         M = cv2.getPerspectiveTransform(pts1, pts2)
         Minv = cv2.getPerspectiveTransform(pts2, pts1)
 
-        size = (640, 480)
+        size = (img.shape[1], img.shape[0])
         dst = cv2.warpPerspective(img, M, size, flags=cv2.INTER_LINEAR)
         _, dst2 = cv2.threshold(dst, lane_bin_threshold, 255, cv2.THRESH_BINARY)
 
         ##자이카 카메라로 촬영한 동영상이므로 전용 보정값 써야햔다.
         return Minv, dst2
 
+    def build_undistort_map(self, camera_matrix, distortion_coeffs, optimal_camera_matrix, optimal_camera_roi, size):
+        """
+        undistort + crop + resize 를 한번의 remap 으로 처리하는 테이블 만들기 (시작할 때 한번만)
+        calibrate_image 와 같은 결과를 낸다.
+        """
+
+        width, height = size
+        map_x, map_y = cv2.initUndistortRectifyMap(camera_matrix, distortion_coeffs, None, optimal_camera_matrix, size, cv2.CV_32FC1)
+
+        # resize 의 좌표 변환 (픽셀 중심 기준) 후 crop 만큼 이동
+        x, y, w, h = optimal_camera_roi
+        grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+        src_x = (grid_x + 0.5) * (float(w) / width) - 0.5 + x
+        src_y = (grid_y + 0.5) * (float(h) / height) - 0.5 + y
+
+        return self.compose_map((map_x, map_y), src_x, src_y)
+
+    def build_warp_map(self, undistort_map, size, work_size=None):
+        """
+        undistort 테이블 뒤에 원근 변환까지 합친 테이블 만들기
+        원본 카메라 이미지 -> 버드아이뷰 를 cv2.remap 한번으로 처리한다.
+        work_size 를 주면 버드아이뷰를 그 해상도로 바로 만든다. (size 기준 좌표를 축소)
+        """
+
+        width, height = size
+        work_width, work_height = work_size or size
+        Minv = cv2.getPerspectiveTransform(self.WARP_DST_POINTS, self.WARP_SRC_POINTS)
+
+        # 버드아이뷰의 각 픽셀이 undistort 이미지의 어디서 왔는지 계산
+        grid = np.mgrid[0:work_height, 0:work_width].astype(np.float32)
+        grid[0] = (grid[0] + 0.5) * (float(height) / work_height) - 0.5
+        grid[1] = (grid[1] + 0.5) * (float(width) / work_width) - 0.5
+        points = np.dstack((grid[1], grid[0])).reshape(-1, 1, 2)
+        src = cv2.perspectiveTransform(points, Minv).reshape(work_height, work_width, 2)
+
+        warp_map = self.compose_map(undistort_map, src[:, :, 0], src[:, :, 1])
+        return Minv, warp_map
+
+    def compose_map(self, base_map, src_x, src_y):
+        """
+        base_map 을 (src_x, src_y) 위치에서 샘플링해서 두 좌표 변환을 하나로 합친다.
+        범위를 벗어나는 곳은 -1 로 채워서 remap 할 때 검은색이 되도록 한다.
+        """
+
+        base_x, base_y = base_map
+        map_x = cv2.remap(base_x, src_x, src_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=-1)
+        map_y = cv2.remap(base_y, src_x, src_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=-1)
+        return map_x, map_y
+
+    def crop_map(self, remap_table, rect):
+        """
+        remap 테이블에서 (x0, y0, x1, y1) 영역만 잘라낸 테이블
+        이 테이블로 remap 하면 원본에서 바로 ROI 만 보정된 이미지가 나온다.
+        """
+
+        x0, y0, x1, y1 = rect
+        map_x, map_y = remap_table
+        return map_x[y0:y1, x0:x1].copy(), map_y[y0:y1, x0:x1].copy()
+
+    def build_valid_mask(self, remap_table, frame_size, margin):
+        """
+        remap 결과 중 실제 카메라 픽셀이 들어오는 영역 마스크
+        테두리 검은 영역에서 생기는 가짜 엣지를 지우기 위해 margin 만큼 깎아둔다.
+        """
+
+        width, height = frame_size
+        map_x, map_y = remap_table
+        valid = (map_x >= 0) & (map_x <= width - 1) & (map_y >= 0) & (map_y <= height - 1)
+        mask = np.uint8(valid) * 255
+
+        kernel = np.ones((margin, margin), np.uint8)
+        return cv2.erode(mask, kernel, borderType=cv2.BORDER_REPLICATE)
+
+    def fix_map(self, remap_table):
+        """
+        float 테이블을 고정소수점 테이블로 바꿔서 remap 속도를 올린다.
+        """
+
+        map_x, map_y = remap_table
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def remap_image(self, frame, remap_table):
+        map1, map2 = remap_table
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+    def lane_processing(self, image_warped, valid_mask, canny_threshold_low, canny_threshold_high, blur=9, dilate=4):
+        """
+        버드아이뷰 이미지에서 바로 차선 엣지 마스크 만들기
+        """
+
+        image_gaussian_blurred = cv2.GaussianBlur(image_warped, (blur,blur), 0)
+        image_edge = cv2.Canny(image_gaussian_blurred, canny_threshold_low, canny_threshold_high)
+
+        kernel = np.ones((dilate,dilate), np.uint8)
+        image_dilated = cv2.dilate(image_edge, kernel)
+
+        return cv2.bitwise_and(image_dilated, valid_mask)
+
     def black2white(self, image):
         """
         검게 보이는 부분 하얗게 날리기
         """
 
-        width = 640
-        height = 480
+        height, width = image.shape[:2]
+        # 아래 좌표는 640x480 기준
+        sx = width / 640.0
+        sy = height / 480.0
 
         # 좌삼각
-        point = np.array([[0, 235], [0, height], [204, height]], np.int32)
+        point = np.int32(np.array([[0, 235], [0, 480], [204, 480]]) * (sx, sy))
         image = cv2.fillConvexPoly(image, point, 255)
         # 우삼각
-        point = np.array([[415, height], [width, height], [width, 235]], np.int32)
+        point = np.int32(np.array([[415, 480], [640, 480], [640, 235]]) * (sx, sy))
         image = cv2.fillConvexPoly(image, point, 255)
 
         # return image
 
         # crop
-        crop_img = image[200:450, 120:480]
+        crop_img = image[int(200 * sy):int(450 * sy), int(120 * sx):int(480 * sx)]
         return crop_img
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+
+class LaneEstimator:
+    """
+    차선 중앙(x, 픽셀)과 방향(도)을 등속 모델 칼만 필터로 추정하기
+
+        estimator.update(center, heading, stamp)   # 인식 결과 (카메라 프레임 시각 기준)
+        estimator.predict()                         # 지금 시각의 (중앙, 방향) 외삽
+
+    중앙과 방향은 서로 독립인 [값, 변화율] 필터 두개로 따로 돈다.
+    마지막 측정 뒤 MAX_HORIZON 초가 지나면 더 외삽하지 않고 그 자리에 멈춘다.
+    (인식이 밀리거나 끊겼을 때 조향이 멀리 튀지 않게)
+
+    상태는 통째로 바꿔 끼우는 튜플이라 다른 스레드에서 predict 해도 된다.
+    """
+
+    def __init__(self, center=300, accel_noise=(1e5, 1e4), measurement_noise=(4.0, 2.0), max_horizon=0.3, clock=time.time):
+        # 채널별 (가속도 잡음 세기, 측정 표준편차): 0 은 중앙, 1 은 방향
+        self.ACCEL_NOISE = accel_noise
+        self.MEASUREMENT_VARIANCE = tuple(noise * noise for noise in measurement_noise)
+        self.MAX_HORIZON = max_horizon
+        self.clock = clock
+        self.reset(center)
+
+    def reset(self, center=300, heading=0.0, stamp=None):
+        """
+        추정값을 버리고 center, heading 에서 다시 시작 (차선 변경 등으로 기준이 바뀔 때)
+        """
+
+        # 채널별 (값, 변화율, P00, P01, P11)
+        channels = tuple((value, 0.0, variance, 0.0, 0.0) for value, variance in zip((center, heading), self.MEASUREMENT_VARIANCE))
+        self.state = (stamp, channels)
+
+    def propagate(self, channel, dt, accel_noise):
+        value, rate, p00, p01, p11 = channel
+        dt2 = dt * dt
+        # x' = F x, P' = F P F^T + Q (등속 모델, 백색 가속도 잡음)
+        return (
+            value + rate * dt,
+            rate,
+            p00 + 2 * dt * p01 + dt2 * p11 + accel_noise * dt2 * dt / 3,
+            p01 + dt * p11 + accel_noise * dt2 / 2,
+            p11 + accel_noise * dt,
+        )
+
+    def correct(self, channel, measured, variance):
+        value, rate, p00, p01, p11 = channel
+        s = p00 + variance
+        k0, k1 = p00 / s, p01 / s
+        innovation = measured - value
+        return (
+            value + k0 * innovation,
+            rate + k1 * innovation,
+            (1 - k0) * p00,
+            (1 - k0) * p01,
+            p11 - k1 * p01,
+        )
+
+    def update(self, center, heading=None, stamp=None):
+        """
+        stamp 시각에 잰 center, heading 반영 (heading 이 None 이면 중앙만)
+        stamp 가 마지막 측정보다 이르면 (순서가 뒤바뀐 프레임) 버린다.
+        """
+
+        if stamp is None:
+            stamp = self.clock()
+        last_stamp, channels = self.state
+        if last_stamp is None:
+            # 첫 측정은 그대로 시작값으로
+            self.reset(center, channels[1][0] if heading is None else heading, stamp)
+            return True
+        if stamp < last_stamp:
+            return False
+
+        dt = stamp - last_stamp
+        updated = []
+        for index, (channel, measured) in enumerate(zip(channels, (center, heading))):
+            channel = self.propagate(channel, dt, self.ACCEL_NOISE[index])
+            if measured is not None:
+                channel = self.correct(channel, measured, self.MEASUREMENT_VARIANCE[index])
+            updated.append(channel)
+        self.state = (stamp, tuple(updated))
+        return True
+
+    def predict(self, stamp=None, state=None):
+        """
+        stamp(기본은 지금) 시각의 (중앙, 방향)
+        state 를 주면 지금 상태 대신 예전에 받아둔 self.state 로 외삽한다.
+        """
+
+        if stamp is None:
+            stamp = self.clock()
+        last_stamp, channels = self.state if state is None else state
+        dt = 0.0
+        if last_stamp is not None:
+            dt = min(max(stamp - last_stamp, 0.0), self.MAX_HORIZON)
+        return tuple(channel[0] + channel[1] * dt for channel in channels)
+
+    def rates(self):
+        """
+        (중앙 변화율 px/s, 방향 변화율 도/s)
+        """
+
+        return tuple(channel[1] for channel in self.state[1])
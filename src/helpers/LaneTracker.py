@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class LaneTracker:
+    """
+    버드아이뷰 차선 마스크에서 왼쪽/오른쪽 차선을 2차 곡선으로 추적하기
+
+    처음(또는 놓쳤을 때)은 열 히스토그램으로 시작점을 잡고 sliding window 로 찾고,
+    그 다음부터는 이전 곡선 주변 좁은 띠만 검사한다.
+    """
+
+    def __init__(self, size=(640, 480), lane_width=130, n_windows=8, window_margin=50, track_margin=30, min_pixels=30, row_step=2, max_lost=5):
+        self.WIDTH, self.HEIGHT = size
+        self.DEFAULT_LANE_WIDTH = lane_width
+        self.N_WINDOWS = n_windows
+        self.WINDOW_MARGIN = window_margin
+        self.TRACK_MARGIN = track_margin
+        self.MIN_PIXELS = min_pixels
+        self.ROW_STEP = row_step
+        self.MAX_LOST = max_lost
+
+        # 차선 탐색은 화면 아래쪽 절반만 사용
+        self.SEARCH_TOP = self.HEIGHT // 2
+        self.ROWS = np.arange(self.SEARCH_TOP, self.HEIGHT, self.ROW_STEP)
+        self.TRACK_OFFSETS = np.arange(-self.TRACK_MARGIN, self.TRACK_MARGIN + 1)
+
+        self.lane_width = lane_width
+        self.reset()
+
+    def reset(self):
+        """
+        추적 중인 곡선을 버리고 다음 프레임에서 처음부터 다시 찾는다.
+        """
+
+        self.left_fit = None
+        self.right_fit = None
+        self.left_lost = 0
+        self.right_lost = 0
+
+    def update(self, mask, center):
+        """
+        새 프레임 마스크로 양쪽 차선 곡선 갱신
+        center 는 왼쪽/오른쪽 차선을 나누는 기준 x 좌표 (보통 직전 차선 중앙)
+        """
+
+        center = int(min(max(center, 0), self.WIDTH - 1))
+
+        left_fit = self.track(mask, self.left_fit) if self.left_fit is not None else None
+        right_fit = self.track(mask, self.right_fit) if self.right_fit is not None else None
+
+        if left_fit is None or right_fit is None:
+            seed_left, seed_right = self.seed(mask, center)
+            if left_fit is None and seed_left is not None:
+                left_fit = self.slide(mask, seed_left)
+            if right_fit is None and seed_right is not None:
+                right_fit = self.slide(mask, seed_right)
+
+        left_fit, right_fit = self.check(left_fit, right_fit)
+
+        self.left_fit, self.left_lost = self.keep(left_fit, self.left_fit, self.left_lost)
+        self.right_fit, self.right_lost = self.keep(right_fit, self.right_fit, self.right_lost)
+
+        return self.left_fit, self.right_fit
+
+    def lane_positions(self, y, center):
+        """
+        y 행에서의 왼쪽/오른쪽 차선 x 좌표
+        한쪽만 보이면 차선 폭만큼 떨어진 곳, 둘 다 없으면 center 기준으로 추정한다.
+        """
+
+        lpos = self.evaluate(self.left_fit, y)
+        rpos = self.evaluate(self.right_fit, y)
+
+        if lpos is not None and rpos is not None:
+            # 둘 다 보일 때 차선 폭을 천천히 학습
+            lane_width = 0.9 * self.lane_width + 0.1 * (rpos - lpos)
+            self.lane_width = int(min(max(lane_width, 0.7 * self.DEFAULT_LANE_WIDTH), 1.4 * self.DEFAULT_LANE_WIDTH))
+        elif lpos is not None:
+            rpos = lpos + self.lane_width
+        elif rpos is not None:
+            lpos = rpos - self.lane_width
+        else:
+            lpos = center - self.lane_width // 2
+            rpos = center + self.lane_width // 2
+
+        return int(lpos), int(rpos)
+
+    def slope(self, y):
+        """
+        y 행에서 보이는 차선 곡선들의 평균 기울기 dx/dy, 차선이 없으면 None
+        (y 는 아래로 갈수록 커지므로 앞쪽 차선이 오른쪽으로 꺾이면 음수)
+        """
+
+        slopes = [2 * fit[0] * y + fit[1] for fit in (self.left_fit, self.right_fit) if fit is not None]
+        if not slopes:
+            return None
+        return float(np.mean(slopes))
+
+    def evaluate(self, fit, y):
+        if fit is None:
+            return None
+        return int(round(np.polyval(fit, y)))
+
+    def seed(self, mask, center):
+        """
+        아래쪽 절반의 열 히스토그램에서 center 와 가장 가까운 차선 시작점 찾기
+        """
+
+        histogram = np.count_nonzero(mask[self.SEARCH_TOP:], axis=0)
+        threshold = self.MIN_PIXELS // 2
+
+        left = np.flatnonzero(histogram[:center] > threshold)
+        right = np.flatnonzero(histogram[center:] > threshold)
+
+        seed_left = int(left[-1]) if len(left) else None
+        seed_right = center + int(right[0]) if len(right) else None
+        return seed_left, seed_right
+
+    def slide(self, mask, base):
+        """
+        base 에서 시작해서 아래에서 위로 window 를 올리며 차선 픽셀 모으기
+        """
+
+        window_height = (self.HEIGHT - self.SEARCH_TOP) // self.N_WINDOWS
+        x_current = base
+        xs, ys = [], []
+
+        for window in range(self.N_WINDOWS):
+            y_high = self.HEIGHT - window * window_height
+            y_low = y_high - window_height
+            x_low = max(x_current - self.WINDOW_MARGIN, 0)
+            x_high = min(x_current + self.WINDOW_MARGIN, self.WIDTH)
+
+            win_y, win_x = np.nonzero(mask[y_low:y_high, x_low:x_high])
+            if len(win_x) == 0:
+                continue
+
+            xs.append(win_x + x_low)
+            ys.append(win_y + y_low)
+            if len(win_x) > self.MIN_PIXELS:
+                x_current = int(np.mean(win_x)) + x_low
+
+        if not xs:
+            return None
+        return self.fit(np.concatenate(xs), np.concatenate(ys))
+
+    def track(self, mask, fit):
+        """
+        이전 곡선 주변 TRACK_MARGIN 폭의 띠 안에서만 차선 픽셀 모으기
+        """
+
+        centers = np.polyval(fit, self.ROWS).astype(np.int32)
+        cols = centers[:, None] + self.TRACK_OFFSETS[None, :]
+        inside = (cols >= 0) & (cols < self.WIDTH)
+        cols = np.clip(cols, 0, self.WIDTH - 1)
+
+        hits = (mask[self.ROWS[:, None], cols] > 0) & inside
+        row_index, col_index = np.nonzero(hits)
+        if len(row_index) == 0:
+            return None
+        return self.fit(cols[row_index, col_index], self.ROWS[row_index])
+
+    def fit(self, xs, ys):
+        if len(xs) < self.MIN_PIXELS:
+            return None
+        # 세로로 짧게 보이는 차선은 곡률을 믿을 수 없으니 직선으로
+        degree = 2 if ys.max() - ys.min() > (self.HEIGHT - self.SEARCH_TOP) // 2 else 1
+        fit = np.polyfit(ys, xs, degree)
+        if degree == 1:
+            fit = np.array([0., fit[0], fit[1]])
+        return fit
+
+    def check(self, left_fit, right_fit):
+        """
+        두 차선이 겹치거나 폭이 말이 안되면 추적 중이던 쪽을 믿지 않는다.
+        """
+
+        if left_fit is None or right_fit is None:
+            return left_fit, right_fit
+
+        width = np.polyval(right_fit, self.HEIGHT - 1) - np.polyval(left_fit, self.HEIGHT - 1)
+        if 0.5 * self.lane_width < width < 1.6 * self.lane_width:
+            return left_fit, right_fit
+
+        # 이전 프레임 곡선과 더 많이 달라진 쪽을 버린다.
+        left_jump = self.jump(left_fit, self.left_fit)
+        right_jump = self.jump(right_fit, self.right_fit)
+        if left_jump > right_jump:
+            return None, right_fit
+        return left_fit, None
+
+    def jump(self, fit, last_fit):
+        if last_fit is None:
+            return float("inf")
+        return abs(np.polyval(fit, self.HEIGHT - 1) - np.polyval(last_fit, self.HEIGHT - 1))
+
+    def keep(self, fit, last_fit, lost):
+        """
+        이번 프레임에 못 찾았으면 MAX_LOST 프레임 동안은 이전 곡선을 유지한다.
+        """
+
+        if fit is not None:
+            return fit, 0
+        if last_fit is not None and lost < self.MAX_LOST:
+            return last_fit, lost + 1
+        return None, lost + 1
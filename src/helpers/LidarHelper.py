@@ -9,38 +9,65 @@ class LidarHelper:
         # constants
         self.DEGREE_TO_LIDAR_RATIO = 1.4027
 
+        # 스캔 길이 -> (cos, sin), 점 두께 -> 도장 오프셋
+        self.angle_tables = {}
+        self.stamp_tables = {}
+
     def degree_to_lidar(self, degree):
         return int(degree * self.DEGREE_TO_LIDAR_RATIO)
 
     def lidar_to_degree(self, index):
         return (index / self.DEGREE_TO_LIDAR_RATIO) * np.pi / 180
 
-    def lidar_visualizer(self, img, left_sensor, right_sensor):
-        sensors = right_sensor + left_sensor
+    def angle_table(self, length):
+        """
+        스캔 길이별 cos/sin 표 (한번만 계산해서 재사용)
+        """
+
+        if length not in self.angle_tables:
+            angles = self.lidar_to_degree(np.arange(length, dtype=np.float64))
+            self.angle_tables[length] = (np.cos(angles), np.sin(angles))
+        return self.angle_tables[length]
+
+    def stamp_table(self, thickness):
+        """
+        점 하나를 찍을 때 칠할 원 모양 픽셀 오프셋 (cv2.line 두께 thickness 짜리 점과 같은 크기)
+        """
+
+        if thickness not in self.stamp_tables:
+            radius = thickness // 2
+            dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+            inside = dx * dx + dy * dy <= radius * radius
+            self.stamp_tables[thickness] = (dy[inside], dx[inside])
+        return self.stamp_tables[thickness]
+
+    def lidar_visualizer(self, img, left_sensor, right_sensor, thickness=10):
+        sensors = np.concatenate((np.asarray(right_sensor, np.float64), np.asarray(left_sensor, np.float64)))
         display_lidar = img
 
-        for i, sensor in enumerate(sensors):
-            angle = self.lidar_to_degree(i)
-            sensor = sensor * 100
-            # print("i", i, "sensor", sensor, "angle", angle)
-            scale = 3.5
-            point = (320 + int(sensor*np.cos(angle)*scale), 480 - int(sensor*np.sin(angle)*scale))
-            # print("point", point)
-            display_lidar = cv2.line(display_lidar, point, point, (255,0,0), 10)
+        cos, sin = self.angle_table(len(sensors))
+        scale = 3.5
+        sensors = sensors * 100 * scale
+        valid = np.isfinite(sensors)
 
+        # 모든 점을 한번에 픽셀 좌표로 바꾸고, 원 모양 도장을 찍어서 한번에 칠한다.
+        height, width = display_lidar.shape[:2]
+        xs = width // 2 + (sensors[valid] * cos[valid]).astype(np.int32)
+        ys = height - (sensors[valid] * sin[valid]).astype(np.int32)
+
+        dy, dx = self.stamp_table(thickness)
+        ys = (ys[:, None] + dy[None, :]).ravel()
+        xs = (xs[:, None] + dx[None, :]).ravel()
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+        display_lidar[ys[inside], xs[inside]] = (255, 0, 0)
         return display_lidar
 
-    def lidar_front(self, sensors):
-        total = 0
-        count = 0
-        for i in range(8):
-            if sensors[i] != 0:
-                count +=1
-                total += sensors[i]
-            if sensors[-i] != 0:
-                count ==1
-                total += sensors[i]
-        try:
-            return total/count
-        except:
-            return 100
\ No newline at end of file
+    def lidar_front(self, scan):
+        """
+        정면 좌우 8칸(약 ±5.7도) 유효 거리의 평균, 없으면 100
+        """
+
+        front = 8 / self.DEGREE_TO_LIDAR_RATIO
+        return scan.mean(-front, front, default=100)
+
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class LidarScan:
+    """
+    라이다 스캔 한장 (float32 배열)과 각도 구간 질의
+
+    0 과 inf 는 측정 실패로 보고 모든 질의에서 뺀다.
+    구간 인덱스는 스캔 길이/각도별로 한번만 계산해서 모든 스캔이 같이 쓴다.
+    """
+
+    DEGREE_TO_LIDAR_RATIO = 1.4027
+
+    # (스캔 길이, 시작 각도, 끝 각도) -> 인덱스 배열
+    sector_cache = {}
+    # 스캔 길이 -> 각 인덱스의 각도(도)
+    degree_cache = {}
+
+    def __init__(self, ranges):
+        self.ranges = np.asarray(ranges, np.float32)
+        self.valid = np.isfinite(self.ranges) & (self.ranges > 0)
+
+        # 기존 ranges_left/ranges_right 와 같은 구간 (복사 없는 view)
+        self.left = self.ranges[:int(90. * self.DEGREE_TO_LIDAR_RATIO)]
+        self.right = self.ranges[int(270. * self.DEGREE_TO_LIDAR_RATIO):]
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def degrees(self):
+        length = len(self.ranges)
+        if length not in self.degree_cache:
+            self.degree_cache[length] = np.arange(length) / self.DEGREE_TO_LIDAR_RATIO
+        return self.degree_cache[length]
+
+    def sector(self, start_degree, end_degree):
+        """
+        start_degree <= 각도 < end_degree 인 인덱스 (0도를 넘어가는 음수 구간도 가능)
+        """
+
+        key = (len(self.ranges), start_degree, end_degree)
+        if key not in self.sector_cache:
+            offset = (self.degrees() - start_degree) % 360
+            self.sector_cache[key] = np.flatnonzero(offset < end_degree - start_degree)
+        return self.sector_cache[key]
+
+    def values(self, start_degree, end_degree):
+        index = self.sector(start_degree, end_degree)
+        return self.ranges[index[self.valid[index]]]
+
+    def min(self, start_degree, end_degree, default=float("inf")):
+        values = self.values(start_degree, end_degree)
+        return float(values.min()) if len(values) else default
+
+    def mean(self, start_degree, end_degree, default=float("inf")):
+        values = self.values(start_degree, end_degree)
+        return float(values.mean()) if len(values) else default
+
+    def median(self, start_degree, end_degree, default=float("inf")):
+        values = self.values(start_degree, end_degree)
+        return float(np.median(values)) if len(values) else default
+
+    def count_below(self, start_degree, end_degree, threshold):
+        values = self.values(start_degree, end_degree)
+        return int(np.count_nonzero(values < threshold))
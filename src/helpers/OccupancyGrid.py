@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cv2
+import numpy as np
+
+class OccupancyGrid:
+    """
+    차를 중심으로 한 라이다 점유 격자 (차 기준 좌표, x 는 앞, y 는 왼쪽, 단위 m)
+
+    새 스캔이 올 때마다 전체 격자를 decay 배로 줄이고 이번 스캔 점만 더한다.
+    처음부터 다시 만들지 않으므로 잠깐 빠진 점도 몇 스캔 동안은 남아 있다.
+    """
+
+    def __init__(self, size=6.0, resolution=0.05, decay=0.6, hit=1.0, occupied=0.5, max_value=3.0):
+        self.RESOLUTION = resolution
+        self.CELLS = int(size / resolution)
+        self.ORIGIN = self.CELLS // 2
+        self.DECAY = decay
+        self.HIT = hit
+        self.OCCUPIED = occupied
+        self.MAX_VALUE = max_value
+
+        self.grid = np.zeros((self.CELLS, self.CELLS), np.float32)
+
+        # 각 칸 중심의 차 기준 좌표와 거리
+        index = (np.arange(self.CELLS) - self.ORIGIN) * resolution
+        self.CELL_X = -index[:, None] + np.zeros((1, self.CELLS))
+        self.CELL_Y = np.zeros((self.CELLS, 1)) - index[None, :]
+        self.CELL_DISTANCE = np.hypot(self.CELL_X, self.CELL_Y).astype(np.float32)
+
+        # 스캔 길이 -> (cos, sin), 다각형 -> 격자 마스크
+        self.angle_tables = {}
+        self.polygon_masks = {}
+
+    def to_cell(self, x, y):
+        row = self.ORIGIN - np.floor(np.asarray(x) / self.RESOLUTION + 0.5).astype(np.int32)
+        col = self.ORIGIN - np.floor(np.asarray(y) / self.RESOLUTION + 0.5).astype(np.int32)
+        return row, col
+
+    def update(self, scan):
+        """
+        라이다 스캔 한장을 격자에 합치기
+        """
+
+        length = len(scan)
+        if length not in self.angle_tables:
+            angles = np.radians(scan.degrees())
+            self.angle_tables[length] = (np.cos(angles), np.sin(angles))
+        cos, sin = self.angle_tables[length]
+
+        self.grid *= self.DECAY
+
+        ranges = scan.ranges[scan.valid]
+        rows, cols = self.to_cell(ranges * cos[scan.valid], ranges * sin[scan.valid])
+        inside = (rows >= 0) & (rows < self.CELLS) & (cols >= 0) & (cols < self.CELLS)
+
+        self.grid[rows[inside], cols[inside]] += self.HIT
+        np.minimum(self.grid, self.MAX_VALUE, out=self.grid)
+
+    def occupied(self):
+        return self.grid > self.OCCUPIED
+
+    def polygon_mask(self, polygon):
+        """
+        차 기준 좌표 (x, y) 점들로 된 다각형 -> 격자 마스크 (다각형마다 한번만 계산)
+        """
+
+        key = tuple(polygon)
+        if key not in self.polygon_masks:
+            xs, ys = zip(*polygon)
+            rows, cols = self.to_cell(xs, ys)
+            points = np.dstack((cols, rows)).astype(np.int32)
+            mask = np.zeros((self.CELLS, self.CELLS), np.uint8)
+            cv2.fillPoly(mask, points, 1)
+            self.polygon_masks[key] = mask.astype(bool)
+        return self.polygon_masks[key]
+
+    def nearest_in_polygon(self, polygon, default=float("inf"), min_cells=1):
+        """
+        다각형 안에서 가장 가까운 장애물까지 거리(m)
+        min_cells 가 1 보다 크면 가까운 순으로 min_cells 번째 칸까지 거리 (점 한두개 잡음은 무시)
+        """
+
+        distances = self.CELL_DISTANCE[self.occupied() & self.polygon_mask(polygon)]
+        if len(distances) < min_cells:
+            return default
+        return float(np.partition(distances, min_cells - 1)[min_cells - 1])
+
+    def count_in_polygon(self, polygon):
+        """
+        다각형 안의 점유된 칸 수
+        """
+
+        return int(np.count_nonzero(self.occupied() & self.polygon_mask(polygon)))
+
+    def corridor_width(self, distance, half_width=1.0):
+        """
+        앞쪽 distance(m) 안에서 차 정면을 포함하는 빈 통로의 폭(m)
+        """
+
+        rows = int(distance / self.RESOLUTION)
+        cols = int(half_width / self.RESOLUTION)
+        ahead = self.occupied()[max(self.ORIGIN - rows, 0):self.ORIGIN, self.ORIGIN - cols:self.ORIGIN + cols + 1]
+        blocked = ahead.any(axis=0)
+
+        center = cols
+        if blocked[center]:
+            return 0.0
+
+        left = np.flatnonzero(blocked[:center])
+        right = np.flatnonzero(blocked[center:])
+        start = left[-1] + 1 if len(left) else 0
+        end = center + right[0] if len(right) else len(blocked)
+        return (end - start) * self.RESOLUTION
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class ScanlineHelper:
+    def __init__(self):
+        pass
+
+    def find_right(self, mask, rows, start):
+        """
+        각 행에서 start 포함 오른쪽으로 가장 가까운 0 이 아닌 픽셀 x 좌표, 없으면 -1
+        """
+
+        width = mask.shape[1]
+        start = max(start, 0)
+        if start >= width:
+            return np.full(len(rows), -1, np.int32)
+
+        band = mask[rows, start:] > 0
+        found = band.any(axis=1)
+        return np.where(found, start + band.argmax(axis=1), -1).astype(np.int32)
+
+    def find_left(self, mask, rows, start):
+        """
+        각 행에서 start 포함 왼쪽으로 가장 가까운 0 이 아닌 픽셀 x 좌표, 없으면 -1
+        """
+
+        width = mask.shape[1]
+        start = min(start, width - 1)
+        if start < 0:
+            return np.full(len(rows), -1, np.int32)
+
+        band = mask[rows, start::-1] > 0
+        found = band.any(axis=1)
+        return np.where(found, start - band.argmax(axis=1), -1).astype(np.int32)
+
+    def find_edges(self, mask, rows, center):
+        """
+        여러 행에 대해 center 기준 왼쪽/오른쪽 차선 위치를 한번에 찾는다.
+        """
+
+        rows = list(rows)
+        return self.find_left(mask, rows, center), self.find_right(mask, rows, center)
@@ -11,6 +11,14 @@ class UltraHelper:
     def ultra_get(self, size, ultra_data):
         pixels = (size[1], size[0], 3)
         zeros = np.zeros(pixels, np.uint8)
+        self.ultra_points(zeros, ultra_data)
+        self.ultra_background(zeros)
+        return zeros
+
+    def ultra_points(self, canvas, ultra_data):
+        """
+        canvas 에 초음파 값 점 5개를 바로 그린다. (캔버스 폭 기준으로 크기 조절)
+        """
 
         # 초음파센서 데이터 출력
         #print("ultra_data:", ultra_data)
@@ -23,17 +31,29 @@ class UltraHelper:
         #time.sleep(0.5)
         # 천천히 출력
         # 다음에 그래픽 만들기
-        scale = 6
-        scale_sin60 = int(scale * 0.5)
-        scale_cos60 = int(scale * 0.8)
+        # 아래 값들은 폭 640 기준, 캔버스 폭에 맞춰 줄인다.
+        ratio = canvas.shape[1] / 640.0
+        scale = 6 * ratio
+        scale_sin60 = int(6 * 0.5) * ratio
+        scale_cos60 = int(6 * 0.8) * ratio
+        radius = max(int(6 * ratio), 1)
+        thickness = max(int(20 * ratio), 1)
 
         ##640의 절반인 320이 카메라 가운데가 아니라 300
-        zeros = cv2.circle(zeros, (300-side_left*scale,10), 6, (100,255,200), 20)
-        zeros = cv2.circle(zeros, (300+side_right*scale,10), 6, (100,255,200), 20)
-        zeros = cv2.circle(zeros, (300+rear_right*scale_cos60,rear_right*scale_sin60), 6, (100,255,200), 20)
-        zeros = cv2.circle(zeros, (300-rear_left*scale_cos60,rear_left*scale_sin60), 6, (100,255,200), 20)
-        zeros = cv2.circle(zeros, (300,rear_center*scale), 6, (100,255,200), 20)
-        zeros = cv2.circle(zeros, (300,-50), 500, (0,0,255), 5)
-
-        #한계선
-        return zeros
+        center = int(300 * ratio)
+        cv2.circle(canvas, (int(center-side_left*scale),int(10*ratio)), radius, (100,255,200), thickness)
+        cv2.circle(canvas, (int(center+side_right*scale),int(10*ratio)), radius, (100,255,200), thickness)
+        cv2.circle(canvas, (int(center+rear_right*scale_cos60),int(rear_right*scale_sin60)), radius, (100,255,200), thickness)
+        cv2.circle(canvas, (int(center-rear_left*scale_cos60),int(rear_left*scale_sin60)), radius, (100,255,200), thickness)
+        cv2.circle(canvas, (center,int(rear_center*scale)), radius, (100,255,200), thickness)
+        return canvas
+
+    def ultra_background(self, canvas):
+        """
+        값과 상관없는 한계선 (한번만 그려두고 재사용)
+        """
+
+        ratio = canvas.shape[1] / 640.0
+        center = int(300 * ratio)
+        cv2.circle(canvas, (center,int(-50*ratio)), int(500*ratio), (0,0,255), max(int(5*ratio), 1))
+        return canvas
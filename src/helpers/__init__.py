@@ -1,14 +1,29 @@
-__all__ = []
+# -*- coding: utf-8 -*-
 
-import pkgutil
-import inspect
+"""
+헬퍼 진입점 (이름 -> "모듈:속성")
 
-for loader, name, is_pkg in pkgutil.walk_packages(__path__):
-    module = loader.find_module(name).load_module(name)
+필요한 곳에서 직접 import 하거나, 쓸지 안 쓸지 모르는 헬퍼는 load 로 처음 쓸 때 불러온다.
 
-    for name, value in inspect.getmembers(module):
-        if name.startswith('__'):
-            continue
+    from helpers.LaneTracker import LaneTracker
+    UltraHelper = helpers.load("UltraHelper")
+"""
 
-        globals()[name] = value
-        __all__.append(name)
+from Registry import Registry
+
+registry = Registry({
+    "ArHelper": "helpers.ArHelper:ArHelper",
+    "ArMarkerStore": "helpers.ArHelper:ArMarkerStore",
+    "ImageHelper": "helpers.ImageHelper:ImageHelper",
+    "LaneEstimator": "helpers.LaneEstimator:LaneEstimator",
+    "LaneTracker": "helpers.LaneTracker:LaneTracker",
+    "LidarHelper": "helpers.LidarHelper:LidarHelper",
+    "LidarScan": "helpers.LidarScan:LidarScan",
+    "OccupancyGrid": "helpers.OccupancyGrid:OccupancyGrid",
+    "ScanlineHelper": "helpers.ScanlineHelper:ScanlineHelper",
+    "UltraHelper": "helpers.UltraHelper:UltraHelper",
+})
+
+
+def load(name):
+    return registry.load(name)
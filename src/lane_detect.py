@@ -11,13 +11,14 @@ import sys
 import os
 import signal
 import math
-from matplotlib import pyplot as plt
 import time
 from std_msgs.msg import Int32MultiArray
 # from numpy.lib.histograms import histogram
 import cv2
 from cv_bridge import CvBridge
 import numpy as np
+from helpers.LaneTracker import LaneTracker
+from helpers.LidarHelper import LidarHelper
 
 # 동영상으로 테스트인 경우, 실차에서는 제거
 #cap = cv2.VideoCapture("/video/xycar_track1.mp4")
@@ -49,20 +50,7 @@ def img_callback(data):
     image = bridge.imgmsg_to_cv2(data,"bgr8")
 
 def lidar_visualizer(img,left_sensor,right_sensor):
-    ratio = 1.4027
-    sensors = right_sensor+left_sensor
-    interface = img
-
-    for i,sensor in enumerate(sensors):
-        angle = (i / ratio)*np.pi / 180
-        sensor = sensor*100
-        #print("i", i, "sensor",sensor,'angle',angle)
-        scale = 3.5
-        point = (320+int(sensor*np.cos(angle)*scale),480-int(sensor*np.sin(angle)*scale))
-        #print('point',point)
-        interface = cv2.line(interface,point,point,(255,0,0),20)
-
-    return interface
+    return lidar_helper.lidar_visualizer(img,left_sensor,right_sensor,20)
 
 def warp_image(img):
     #pts1 =np.float32([[228,290],[75,385],[423,290],[573,385]])
@@ -142,36 +130,18 @@ def black2white(image):
     crop_img = image[200:450, 120:480]
     return crop_img
 
-def waypoint(image):
+def waypoint(mask, image):
     global c
     waypoints = []
     #cv2.imshow('image',image)
-    lpos, rpos = -1,-1
-    for i in range(c,640):
-        if image[445][i][0] > 0:
-            rpos = i
-            break
-    for i in range(c,-1,-1):
-        if image[445][i][0] > 0:
-            lpos = i
-            break
-    
-    if lpos ==-1 or rpos == -1:
-        if rpos != -1:
-            lpos = rpos -130
-        elif lpos != -1:
-            rpos = lpos + 130
-        else:
-            lpos, rpos = 250,350
+    lane_tracker.update(mask, c)
+    lpos, rpos = lane_tracker.lane_positions(445, c)
     c = (rpos+lpos)//2
     
     
     
 
     new_img = cv2.line(image,(0,445),(640,445), (0,0,255), 2)
-    image.mean(axis=2)
-    
-    #480,640,3
 
     steer = int((c -300)//2)
     if abs(steer) < 20:
@@ -244,9 +214,9 @@ def main():
         #cv2.imshow('gray', gray)
         #print('gray',gray.shape)
 
-        Minv, warped = warp_image(gray)
-        #cv2.imshow('warped2', warped)
-        warped = cv2.cvtColor(warped,cv2.COLOR_GRAY2BGR)
+        Minv, mask = warp_image(gray)
+        #cv2.imshow('warped2', mask)
+        warped = cv2.cvtColor(mask,cv2.COLOR_GRAY2BGR)
             
         #print('warped',warped.shape)
 
@@ -258,7 +228,7 @@ def main():
         interface = lidar_visualizer(warped,left_sensor,right_sensor)
         #cv2.imshow('interface',interface)
 
-        waypoints = waypoint(warped)
+        waypoints = waypoint(mask, warped)
         if ultra_msg == None:
             continue
         ultra_get()
@@ -286,6 +256,8 @@ if __name__ == '__main__':
     left_sensor = []
     right_sensor = []
     c = 300
+    lane_tracker = LaneTracker()
+    lidar_helper = LidarHelper()
     if calibrated:
         mtx = np.array([
             [422.037858, 0.0, 245.895397],
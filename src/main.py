@@ -1,66 +1,288 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
+# 시작 시간 보고의 기준 (무거운 import 전에 잰다)
+STARTED = time.time()
+
 import sys
 import os
 import signal
+import argparse
+import multiprocessing
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import rospy, rospkg
+import cv2
 import numpy as np
 from SensorData import SensorData
 from SelfDriver import SelfDriver
+from DriverConfig import default_config
+from Recorder import SessionRecorder
+from Pipeline import DrivingPipeline, board_buffers, put_latest
+from Viewer import Viewer
+from Profiler import FrameProfiler, FileSink, StartupTimer
+from SteeringLoop import SteeringLoop
+from SharedSensors import SharedSensors, SharedSensorData, SharedSensorReader, pin_to_cpus
+import Logger
+import detect
+import helpers
 
 from xycar_msgs.msg import xycar_motor
 from sensor_msgs.msg import Image
 from sensor_msgs.msg import LaserScan
 from std_msgs.msg import Int32MultiArray
+from std_msgs.msg import String
 from ar_track_alvar_msgs.msg import AlvarMarkers
 
+log = Logger.get_logger("main")
+
+
 def signal_handler(sig, frame):
     os.system("killall -9 python rosout")
     sys.exit(0)
 
 
+def parse_cpus(text):
+    return set(int(cpu) for cpu in text.split(",")) if text else None
+
+
+def setup_profiler_sink(profiler, args):
+    # rospy.init_node 다음에 호출한다.
+    if args.profile_file:
+        profiler.sink = FileSink(args.profile_file)
+    elif args.profile_topic:
+        profile_pub = rospy.Publisher(args.profile_topic, String, queue_size=1)
+        profiler.sink = profile_pub.publish
+    elif args.profile:
+        profiler.sink = rospy.loginfo
+
+
+def motor_publisher():
+    motor_msg = xycar_motor()
+    pub = rospy.Publisher("xycar_motor",xycar_motor, queue_size=1)
+
+    def publish(steer, speed):
+        motor_msg.angle = steer
+        motor_msg.speed = speed
+        pub.publish(motor_msg)
+    return publish
+
+
+def report_first_command(publish, startup):
+    """
+    첫 모터 명령을 보낼 때 시작부터 걸린 시간 요약을 한번 남긴다.
+    실제로 토픽에 발행하는 publish 를 감싼다. (--steer-hz 면 SteeringLoop 가 부르는 쪽)
+    """
+
+    def publish_and_report(steer, speed):
+        publish(steer, speed)
+        if not startup.done("first command"):
+            startup.mark("first command")
+            log.info("%s", startup.summary((helpers.registry, detect.registry)))
+    return publish_and_report
+
+
+def start_steering(driver, publish, hz):
+    """
+    hz 가 있으면 SteeringLoop 가 그 주기로 발행하고 인식 루프는 결정만 갱신한다.
+    인식 루프가 쓸 publish 를 돌려준다. (rospy.init_node 다음에 호출)
+    """
+
+    if hz <= 0:
+        return publish
+
+    steering = SteeringLoop(driver, publish, hz, driver.clock)
+    rospy.on_shutdown(steering.stop)
+    steering.start()
+    return lambda steer, speed: None
+
+
+def drive_loop(driver, sensor_data, publish, viewer, max_rate):
+    """
+    새 프레임이 들어올 때마다 한번씩 깨어나서 처리한다.
+    sensor_data 는 SensorData 또는 SharedSensorReader
+    """
+
+    rospy.on_shutdown(sensor_data.close)
+    min_period = 1.0 / max_rate if max_rate > 0 else 0
+
+    seq = 0
+    while seq is not None and (sensor_data.image is None or sensor_data.image.shape != (driver.IMAGE_HEIGHT, driver.IMAGE_WIDTH, 3)):
+        seq = sensor_data.wait_for_image(seq)
+
+    while seq is not None and not rospy.is_shutdown():
+        started = time.time()
+
+        # 프레임을 검사하기 전에는 결정을 확정하지 않는다. (SteeringLoop 가 바로 가져다 쓰므로)
+        steer, speed = driver.get_next_direction(sensor_data, commit=False)
+        snapshot = driver.sensor_data
+        if snapshot is not None and not sensor_data.frame_valid(snapshot):
+            # 공유 메모리 슬롯이 처리 도중 덮어쓰였으면 섞인 프레임으로 낸 결정은 보내지 않는다.
+            driver.discard_command()
+            log.warn("camera frame %d was overwritten while it was processed, command dropped", snapshot.image_seq)
+        else:
+            driver.commit_command()
+            publish(steer, speed)
+        # 기다린 프레임이 아니라 실제로 처리한 스냅샷 순번부터 다음 프레임을 기다린다.
+        # (기다린 뒤 스냅샷 전에 새 프레임이 들어왔으면 그 프레임을 두번 처리하게 된다)
+        if snapshot is not None:
+            seq = max(seq, snapshot.image_seq)
+
+        if viewer is not None:
+            viewer.publish(driver.display_board)
+        else:
+            driver.visualize()
+
+        # --max-rate 보다 빨리 돌지 않게 남은 시간만큼 쉰 뒤 최신 프레임을 기다린다.
+        if min_period:
+            remaining = min_period - (time.time() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+        seq = sensor_data.wait_for_image(seq)
+
+
+def show_window_loop(boards):
+    """
+    --pipeline 의 표시판 창 (메인 스레드에서 돈다)
+    HighGUI 는 메인 스레드에서만 불러야 하므로 visualization 단계는 boards 큐에 넣기만 하고 여기서 띄운다.
+    """
+
+    while not rospy.is_shutdown():
+        try:
+            board = boards.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        cv2.imshow("Sensor data display board", board)
+        cv2.waitKey(1)
+
+
+def run_driver_process(shared, driver, profiler, viewer, startup, args):
+    """
+    --shared 모드의 드라이버 프로세스: 공유 메모리에서 센서를 읽어 SelfDriver 를 돌리고 모터 명령 발행
+    """
+
+    signal.signal(signal.SIGINT, signal_handler)
+    Logger.manager.after_fork()
+    pin_to_cpus(parse_cpus(args.driver_cpus), "driver")
+
+    rospy.init_node("lane_detect_driver")
+    startup.mark("init_node")
+    setup_profiler_sink(profiler, args)
+    publish = start_steering(driver, report_first_command(motor_publisher(), startup), args.steer_hz)
+    drive_loop(driver, SharedSensorReader(shared), publish, viewer, args.max_rate)
+
+
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
+    startup = StartupTimer(STARTED)
+    startup.mark("imports")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", action="store_true", help="run decode, preprocess, decision and visualization in separate threads")
+    parser.add_argument("--headless", action="store_true", help="skip all display board compositing")
+    parser.add_argument("--viewer", choices=["window", "mjpeg"], help="draw the display board in a separate viewer process")
+    parser.add_argument("--viewer-hz", type=float, default=10, help="viewer refresh rate")
+    parser.add_argument("--viewer-port", type=int, default=8090, help="local MJPEG port for --viewer mjpeg")
+    parser.add_argument("--record", metavar="PATH", help="record camera, lidar, ultrasonic and AR messages to a session file")
+    parser.add_argument("--profile", action="store_true", help="measure per-phase timing and deadline misses")
+    parser.add_argument("--profile-file", metavar="PATH", help="append the periodic timing summary to this file")
+    parser.add_argument("--profile-topic", metavar="TOPIC", help="publish the periodic timing summary on this topic")
+    parser.add_argument("--log-level", choices=["debug", "info", "warn", "error"], default="info", help="lowest log level to print")
+    parser.add_argument("--log-every", type=float, default=1.0, help="print each log message at most once per this many seconds")
+    parser.add_argument("--work-size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="lane processing resolution, e.g. 320 240")
+    parser.add_argument("--shared", action="store_true", help="run SelfDriver in a separate process fed through shared memory")
+    parser.add_argument("--driver-cpus", metavar="LIST", help="with --shared, pin the driver process to these CPUs, e.g. 2,3")
+    parser.add_argument("--subscriber-cpus", metavar="LIST", help="with --shared, pin the subscriber process to these CPUs, e.g. 0,1")
+    parser.add_argument("--max-rate", type=float, default=0, help="process at most this many frames per second (0: every frame)")
+    parser.add_argument("--steer-hz", type=float, default=0, help="publish motor commands at this fixed rate, extrapolating the lane center between frames (0: once per frame)")
+    args = parser.parse_args(rospy.myargv()[1:])
+    Logger.configure(args.log_level, args.log_every)
+
+    driver_config = default_config()
+    driver_config["headless"] = args.headless
+    if args.work_size:
+        driver_config["work_width"], driver_config["work_height"] = args.work_size
+    if args.pipeline:
+        # 아직 그리는 중이거나 보여주는 중인 표시판을 덮어쓰지 않게 파이프라인 깊이만큼 만든다.
+        window = not args.headless and not args.viewer
+        driver_config["display_buffers"] = board_buffers(window=window)
 
-    driver_config = {
-        "image_width": 640,
-        "image_height": 480,
-        "image_offset": 280,
-        "image_gap": 36,
-        "lane_bin_threshold": 130,
-        "camera_matrix": np.array([
-            [422.037858, 0.0, 245.895397],
-            [0.0,435.589734, 163.625535],
-            [0.0,0.0, 1.0]
-        ]),
-        "distortion_coeffs": np.array([-0.2789296, 0.061035, 0.001786, 0.015238, 0.0]),
-    }
+    profiler = FrameProfiler(enabled=args.profile or bool(args.profile_file or args.profile_topic))
+    driver_config["profiler"] = profiler
 
     driver = SelfDriver(driver_config)
-    sensor_data = SensorData()
+    startup.mark("driver")
+    rospy.on_shutdown(Logger.manager.close)
 
-    motor_msg = xycar_motor()
-    pub = rospy.Publisher("xycar_motor",xycar_motor, queue_size=1)
+    recorder = SessionRecorder(args.record) if args.record else None
+    shared = None
+    if args.shared:
+        shared = SharedSensors((driver.IMAGE_HEIGHT, driver.IMAGE_WIDTH, 3))
+        sensor_data = SharedSensorData(shared, recorder=recorder)
+    else:
+        sensor_data = SensorData(recorder=recorder)
+    if recorder is not None:
+        rospy.on_shutdown(recorder.close)
+
+    # 뷰어, 드라이버 프로세스는 rospy 스레드가 생기기 전에 fork 한다.
+    viewer = None
+    if args.viewer and not args.headless:
+        viewer = Viewer(args.viewer, args.viewer_hz, args.viewer_port)
+        viewer.start()
+
+    if args.shared:
+        driver_process = multiprocessing.Process(target=run_driver_process, name="driver", args=(shared, driver, profiler, viewer, startup, args))
+        driver_process.daemon = True
+        driver_process.start()
+        pin_to_cpus(parse_cpus(args.subscriber_cpus), "subscriber")
 
     rospy.init_node("lane_detect")
-    rospy.Subscriber("/usb_cam/image_raw", Image, sensor_data.image_callback, queue_size=1)
+    startup.mark("init_node")
+
+    if args.shared:
+        # 이 프로세스는 구독해서 공유 메모리에 쓰기만 한다.
+        rospy.Subscriber("/usb_cam/image_raw", Image, sensor_data.image_callback, queue_size=1)
+        rospy.Subscriber("/scan", LaserScan, sensor_data.lidar_callback, queue_size=1)
+        rospy.Subscriber("xycar_ultrasonic", Int32MultiArray, sensor_data.ultra_callback, queue_size=1)
+        rospy.Subscriber('ar_pose_marker', AlvarMarkers, sensor_data.ar_callback,queue_size = 1)
+        rospy.on_shutdown(shared.close)
+        rospy.spin()
+        driver_process.join(1.0)
+        sys.exit(0)
+
+    setup_profiler_sink(profiler, args)
+    publish = start_steering(driver, report_first_command(motor_publisher(), startup), args.steer_hz)
+
+    window_boards = None
+    if args.pipeline:
+        if args.headless:
+            show = None
+        elif viewer is not None:
+            show = viewer.publish
+        else:
+            window_boards = queue.Queue(1)
+            show = lambda display_board: put_latest(window_boards, display_board)
+
+        pipeline = DrivingPipeline(driver, sensor_data, publish, show)
+        rospy.Subscriber("/usb_cam/image_raw", Image, pipeline.submit_image, queue_size=1)
+    else:
+        rospy.Subscriber("/usb_cam/image_raw", Image, sensor_data.image_callback, queue_size=1)
     rospy.Subscriber("/scan", LaserScan, sensor_data.lidar_callback, queue_size=1)
     rospy.Subscriber("xycar_ultrasonic", Int32MultiArray, sensor_data.ultra_callback, queue_size=1)
     rospy.Subscriber('ar_pose_marker', AlvarMarkers, sensor_data.ar_callback,queue_size = 1)
-    rate = rospy.Rate(30)
-    while sensor_data.image is None or sensor_data.image.size != (640 * 480 * 3):
-        continue
-    while not rospy.is_shutdown():
-        # main()
-
-        steer, speed = driver.get_next_direction(sensor_data)
-        motor_msg.angle = steer
-        motor_msg.speed = speed
-
-        pub.publish(motor_msg)
 
-        driver.visualize()
+    if args.pipeline:
+        pipeline.start()
+        if window_boards is not None:
+            show_window_loop(window_boards)
+        else:
+            rospy.spin()
+        pipeline.stop()
+        sys.exit(0)
 
-        rate.sleep()
+    drive_loop(driver, sensor_data, publish, viewer, args.max_rate)